@@ -0,0 +1,6 @@
+"""
+Benchmarks for tidycensus, written for airspeed velocity (asv).
+
+Run them from the repository root with ``asv run`` or, against the working
+tree, ``asv run --python=same --quick``.
+"""
@@ -0,0 +1,70 @@
+"""Synthetic Census API data for the benchmarks."""
+import json
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_geographies(n_rows, seed=42):
+    """Block group ID columns as the API returns them (all strings)."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "state": np.char.zfill(rng.integers(1, 57, n_rows).astype(str), 2),
+            "county": np.char.zfill(rng.integers(1, 999, n_rows).astype(str), 3),
+            "tract": np.char.zfill(rng.integers(1, 999999, n_rows).astype(str), 6),
+            "block group": rng.integers(1, 9, n_rows).astype(str),
+        },
+        dtype=object,
+    )
+
+
+def synthetic_chunks(n_rows, n_chunks, vars_per_chunk=24, seed=42):
+    """Wide results for ``n_chunks`` chunks of estimate/MOE pairs."""
+    rng = np.random.default_rng(seed)
+    geoid = synthetic_geographies(n_rows, seed=seed).sum(axis=1).to_numpy()
+    name = np.array([f"Block Group {i}" for i in range(n_rows)], dtype=object)
+
+    chunks = []
+    for c in range(n_chunks):
+        columns = [
+            f"B{c:05d}_{i:03d}{suffix}"
+            for i in range(1, vars_per_chunk + 1)
+            for suffix in "EM"
+        ]
+        dat = pd.DataFrame(rng.random((n_rows, len(columns))) * 1000, columns=columns)
+        dat["NAME"] = name
+        dat["GEOID"] = geoid
+        chunks.append(dat)
+    return chunks
+
+
+def synthetic_variables(n_vars):
+    """Estimate/MOE names for ``n_vars`` variables, in 24-variable tables."""
+    return [
+        f"B{i // 24:05d}_{i % 24 + 1:03d}{suffix}"
+        for i in range(n_vars)
+        for suffix in "EM"
+    ]
+
+
+def synthetic_response(n_rows, n_vars, missing_rate=0.01, seed=42):
+    """
+    The raw JSON the API returns for ``n_vars`` variables at block groups:
+    a header row, then one row of strings per geography, with a share of
+    the values replaced by Census missing value codes.
+    """
+    rng = np.random.default_rng(seed)
+    variables = synthetic_variables(n_vars)
+
+    values = rng.integers(0, 10000, (n_rows, len(variables)))
+    missing = rng.random(values.shape) < missing_rate
+    values[missing] = -666666666
+    values = values.astype(str)
+
+    geos = synthetic_geographies(n_rows, seed=seed).to_numpy()
+    names = np.array([f"Block Group {i}" for i in range(n_rows)], dtype=object)
+
+    header = ["NAME"] + variables + ["state", "county", "tract", "block group"]
+    rows = np.concatenate([names[:, None], values.astype(object), geos], axis=1)
+    return json.dumps([header] + rows.tolist()).encode("utf-8")
@@ -0,0 +1,26 @@
+"""Building the GEOID column from the geography ID columns."""
+from tidycensus.parsers import build_geoid
+
+from .common import synthetic_geographies
+
+ID_VARS = ["state", "county", "tract", "block group"]
+
+
+class GEOID:
+
+    params = [10_000, 100_000, 1_000_000]
+    param_names = ["rows"]
+    timeout = 600
+
+    def setup(self, rows):
+        self.dat = synthetic_geographies(rows)
+
+    def time_row_apply(self, rows):
+        # The previous row-by-row implementation, kept as the baseline
+        self.dat[ID_VARS].apply(lambda row: "".join(row.astype(str)), axis=1)
+
+    def time_vectorized(self, rows):
+        build_geoid(self.dat, ID_VARS)
+
+    def peakmem_vectorized(self, rows):
+        build_geoid(self.dat, ID_VARS)
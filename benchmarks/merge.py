@@ -0,0 +1,41 @@
+"""Combining the results for chunks of variables."""
+from functools import reduce
+
+import pandas as pd
+
+from tidycensus.reshape import combine_chunks
+
+from .common import synthetic_chunks
+
+
+def merge_chunks(frames):
+    # The previous pairwise outer merge, kept as the baseline; NAME is dropped
+    # from the right-hand side because repeated "NAME.y" columns are an error
+    # in recent versions of pandas
+    return reduce(
+        lambda left, right: pd.merge(
+            left, right.drop(columns="NAME"), on="GEOID", how="outer"
+        ),
+        frames,
+    )
+
+
+class CombineChunks:
+
+    params = [5, 20, 50]
+    param_names = ["chunks"]
+
+    def setup(self, chunks):
+        self.frames = synthetic_chunks(10_000, chunks)
+
+    def time_reduce_merge(self, chunks):
+        merge_chunks(self.frames)
+
+    def time_combine_chunks(self, chunks):
+        combine_chunks(self.frames)
+
+    def peakmem_reduce_merge(self, chunks):
+        merge_chunks(self.frames)
+
+    def peakmem_combine_chunks(self, chunks):
+        combine_chunks(self.frames)
@@ -0,0 +1,112 @@
+"""
+Each stage of turning API responses into results, at scale.
+
+The stages run on synthetic block group responses with 1k to 1M rows and
+10 to 500 variables. Combinations with more cells than ``MAX_CELLS`` are
+skipped.
+"""
+from tidycensus.parsers import parse_response, replace_missing
+from tidycensus.reshape import combine_chunks, format_acs
+
+from .common import synthetic_response, synthetic_variables
+
+# The largest number of estimate/MOE values to benchmark
+MAX_CELLS = 20_000_000
+
+
+def too_big(rows, n_vars):
+    return rows * 2 * n_vars > MAX_CELLS
+
+
+class Stage:
+
+    params = [[1_000, 100_000, 1_000_000], [10, 100, 500]]
+    param_names = ["rows", "variables"]
+    timeout = 600
+
+    def setup_cache(self):
+        # Build every response once; the stages start from what they need
+        data = {}
+        for rows in self.params[0]:
+            for n_vars in self.params[1]:
+                if not too_big(rows, n_vars):
+                    data[rows, n_vars] = self.prepare(rows, n_vars)
+        return data
+
+    def prepare(self, rows, n_vars):
+        return synthetic_response(rows, n_vars)
+
+    def setup(self, data, rows, n_vars):
+        if too_big(rows, n_vars):
+            raise NotImplementedError
+        self.data = data[rows, n_vars]
+        self.variables = synthetic_variables(n_vars)
+
+
+class Parse(Stage):
+    """Decoding the JSON and building the columns and GEOID."""
+
+    def time_parse(self, data, rows, n_vars):
+        parse_response(self.data, self.variables)
+
+    def peakmem_parse(self, data, rows, n_vars):
+        parse_response(self.data, self.variables)
+
+
+class ReplaceMissing(Stage):
+    """Replacing the Census missing value codes with NaN."""
+
+    def prepare(self, rows, n_vars):
+        return parse_response(
+            synthetic_response(rows, n_vars), synthetic_variables(n_vars)
+        )
+
+    def time_replace(self, data, rows, n_vars):
+        replace_missing(self.data, self.variables)
+
+    def time_replace_annotate(self, data, rows, n_vars):
+        replace_missing(self.data, self.variables, annotate=True)
+
+    def peakmem_replace(self, data, rows, n_vars):
+        replace_missing(self.data, self.variables)
+
+
+class Combine(Stage):
+    """Joining the 24-variable chunks a request is split into."""
+
+    def prepare(self, rows, n_vars):
+        dat = parse_response(
+            synthetic_response(rows, n_vars), synthetic_variables(n_vars)
+        )
+        variables = synthetic_variables(n_vars)
+        return [
+            dat[["GEOID", "NAME"] + variables[i : i + 48]]
+            for i in range(0, len(variables), 48)
+        ]
+
+    def time_combine(self, data, rows, n_vars):
+        combine_chunks(self.data)
+
+    def peakmem_combine(self, data, rows, n_vars):
+        combine_chunks(self.data)
+
+
+class Format(Stage):
+    """Formatting the cleaned results as tidy and wide output."""
+
+    def prepare(self, rows, n_vars):
+        variables = synthetic_variables(n_vars)
+        dat = parse_response(synthetic_response(rows, n_vars), variables)
+        return replace_missing(dat, variables)[0]
+
+    def time_tidy(self, data, rows, n_vars):
+        format_acs(self.data, self.variables, output="tidy")
+
+    def time_wide(self, data, rows, n_vars):
+        format_acs(self.data, self.variables, output="wide", moe_factor=1.2)
+
+    def peakmem_tidy(self, data, rows, n_vars):
+        format_acs(self.data, self.variables, output="tidy")
+
+    def peakmem_wide(self, data, rows, n_vars):
+        format_acs(self.data, self.variables, output="wide", moe_factor=1.2)
@@ -1,7 +1,44 @@
+from importlib import import_module
 from pathlib import Path
 
 __version__ = "0.0.1"
 
 DATA_DIR = Path(__file__).parent.absolute() / "data"
 
-from .acs import get_acs
+# The public API, imported on first use so that `import tidycensus` does not
+# pull in pandas, numpy or requests
+_lazy_imports = {
+    "aget_acs": ".aio",
+    "get_acs": ".acs",
+    "get_acs_batch": ".batch",
+    "get_acs_panel": ".panel",
+    "iter_acs": ".acs",
+    "plan_acs": ".acs",
+    "DiskCache": ".cache",
+    "load_variables_acs": ".variables",
+    "execute_plan": ".plan",
+    "MetricsCollector": ".metrics",
+    "add_metrics_hook": ".metrics",
+    "remove_metrics_hook": ".metrics",
+    "read_acs_dataset": ".sink",
+    "set_rate_limit": ".retry",
+    "set_session": ".session",
+    "sink_acs": ".sink",
+    "resolve_counties": ".utils",
+    "validate_county": ".utils",
+    "validate_state": ".utils",
+}
+
+__all__ = list(_lazy_imports)
+
+
+def __getattr__(name):
+    if name in _lazy_imports:
+        value = getattr(import_module(_lazy_imports[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_imports))
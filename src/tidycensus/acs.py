@@ -1,25 +1,45 @@
 """Obtain data for the American Community Survey."""
 import os
 import sys
-from functools import reduce
-from itertools import groupby
 from re import match
 
-import numpy as np
-import pandas as pd
 from loguru import logger
-from tryagain import retries
 
-from .loaders import format_variables_acs, load_data_acs
+from .cache import resolve_cache
+from .loaders import build_call_acs, format_variables_acs
+from .parallel import DEFAULT_MAX_WORKERS
+from .plan import AcsPlan, ApiCall, Partition, cache_status, execute_plan, iter_plan
+from .reshape import get_moe_factor
 from .utils import verify_list_inputs
+from .variables import load_variables_acs, variables_from_table_acs
 
 
-# @retries(
-#     max_attempts=3,
-#     wait=lambda n: 2 ** n,
-#     pre_retry_hook=lambda: logger.info("Call failed. Retrying..."),
-# )
-def get_acs(
+def table_survey(table, survey):
+
+    # The endpoint (relative to the survey) that serves a table
+    if match("^S\d.", table):
+        return survey + "/subject"
+    elif match("^DP\d.", table):
+        return survey + "/profile"
+    elif match("^K\d.", table):
+        return "acsse"
+    else:
+        return survey
+
+
+def variable_type(variable):
+
+    # Variables from different types of tables come from different endpoints
+    if match("^B|^C", variable):
+        return "B"
+    elif match("^K\d.", variable):
+        return "K"
+    elif match("^DP", variable):
+        return "DP"
+    return variable[0]
+
+
+def plan_acs(
     geography,
     variables=None,
     table=None,
@@ -34,14 +54,21 @@ def get_acs(
     moe_level=90,
     survey="acs5",
     show_call=False,
-    verbose=False,
     errors="coerce",
+    cache=None,
+    session=None,
+    annotate_missing=False,
+    compact=False,
 ):
-    """"""
-    # Set the logging level to warnings or higher
-    if not verbose:
-        logger.remove()
-        logger.add(sys.stderr, level="WARNING")
+    """
+    Plan the API calls for a ``get_acs`` request without sending them.
+
+    Takes the same arguments as :func:`get_acs` and returns an
+    :class:`~tidycensus.plan.AcsPlan`. Only the variable catalog is
+    downloaded, and only if a whole ``table`` is requested.
+    """
+    # Resolve the response cache
+    cache = resolve_cache(cache)
 
     # Handle dict variables
     renamed_variables = None
@@ -126,188 +153,52 @@ def get_acs(
         )
 
     # if variables from more than one type of table (e.g. "S1701_C03_002" and "B05002_013"))
-    # are requested - take care of this under the hood by having the function
-    # call itself for "B" variables, "S" variabls and "DP" variables then combining the results
-    if len(variables):
-        table_identifiers = list(set([var[0] for var in variables]))
-        if len(table_identifiers) > 1 and not all(
-            s in ["B", "C"] for s in table_identifiers
-        ):
-
-            # Check for supplemental estimates
-            if any([match("^K\d.", var) for var in variables]):
-                raise ValueError(
-                    "At the moment, supplemental estimates variables cannot be combined with variables from other datasets."
-                )
-
-            logger.info(
-                'Fetching data by table type ("B/C", "S", "DP") and combining the result.'
-            )
-
-            # split variables by type into list
-            patterns = ["^B|^C", "^S", "^D"]
-            vars_by_type = list(
-                map(
-                    lambda pattern: [
-                        list(v)
-                        for k, v in groupby(
-                            variables, key=lambda s: match(pattern, s) is not None
-                        )
-                        if k
-                    ][0],
-                    patterns,
-                )
-            )
-
-            # Get all of the results and combine
-            result = pd.concat(
-                map(
-                    vars_by_type,
-                    lambda vars: get_acs(
-                        geography,
-                        variables=vars,
-                        table=table,
-                        year=year,
-                        output=output,
-                        state=state,
-                        county=county,
-                        zcta=zcta,
-                        place=place,
-                        cbsa=cbsa,
-                        key=key,
-                        moe_level=moe_level,
-                        survey=survey,
-                        show_call=show_call,
-                        errors=errors,
-                    ),
-                )
-            )
-
-            # sort so all vars for each GEOID is together
-            return result.sort_values("GEOID")
-
-    # If more than one state specified for tracts/block groups take care of
-    # this under the hood by having the function
-    # call itself and return the result
-    if (geography == "tract" or geography == "block group") and len(state) > 1:
+    # are requested - take care of this under the hood by fetching the "B"
+    # variables, "S" variables and "DP" variables separately then combining the results
+    kinds = list(dict.fromkeys(variable_type(var) for var in variables))
+    if len(kinds) > 1:
 
-        logger.info(f"Fetching {geography} data by state and combining the result.")
-        return pd.concat(
-            map(
-                state,
-                lambda s: get_acs(
-                    geography,
-                    variables=vars,
-                    table=table,
-                    year=year,
-                    output=output,
-                    state=s,
-                    county=county,
-                    zcta=zcta,
-                    place=place,
-                    cbsa=cbsa,
-                    key=key,
-                    moe_level=moe_level,
-                    survey=survey,
-                    show_call=show_call,
-                    errors=errors,
-                ),
+        # Check for supplemental estimates
+        if "K" in kinds:
+            raise ValueError(
+                "At the moment, supplemental estimates variables cannot be combined with variables from other datasets."
             )
-        )
-
-    # This should be cleaned up and combined with some of the code earlier up
-    # but we still need to iterate through counties for block groups earlier than 2013
-    if year < 2013 and (geography == "block group" and len(county) > 1):
 
-        logger.info("Fetching block group data by county and combining the result.")
-        return pd.concat(
-            map(
-                county,
-                lambda c: get_acs(
-                    geography,
-                    variables=vars,
-                    table=table,
-                    year=year,
-                    output=output,
-                    state=state,
-                    county=c,
-                    zcta=zcta,
-                    place=place,
-                    cbsa=cbsa,
-                    key=key,
-                    moe_level=moe_level,
-                    survey=survey,
-                    show_call=show_call,
-                    errors=errors,
-                ),
-            )
+        logger.info(
+            'Fetching data by table type ("B/C", "S", "DP") and combining the result.'
         )
 
     # Get the margin of error factor
-    if moe_level == 90:
-        moe_factor = 1
-    elif moe_level == 95:
-        moe_factor = 1.96 / 1.645
-    elif moe_level == 99:
-        moe_factor = 2.56 / 1.645
-    else:
-        raise ValueError(f"`moe_level` must be one of 90, 95, or 99.")
+    moe_factor = get_moe_factor(moe_level)
 
     # Logic for fetching data tables
+    catalog = None
     if table is not None:
-        if match("^S\d.", table):
-            survey2 = survey + "/subject"
-        elif match("^DP\d.", table):
-            survey2 = survey + "/profile"
-        elif match("^K\d.", table):
-            survey2 = "acsse"
-        else:
-            survey2 = survey
+        survey2 = table_survey(table, survey)
 
         # Get the variables
-        variables = variables_from_table_acs(table, year, survey2)
-
-    # Handle variable list of any length
-    if len(variables) > 24:
-
-        l = []
-        start = 0
-        while start < len(variables):
-            stop = start + 24
-            l.append(variables[start:stop])
-            start = stop
-
-        # Get the data
-        dat = map(
-            lambda x: load_data_acs(
-                geography,
-                format_variables_acs(x),
-                key,
-                year,
-                survey,
-                state=state,
-                county=county,
-                zcta=zcta,
-                place=place,
-                cbsa=cbsa,
-                show_call=show_call,
-                errors=errors,
-            ),
-            l,
-        )
+        catalog = load_variables_acs(year, survey2, session=session)
+        variables = variables_from_table_acs(table, year, survey2, session=session)
+        kinds = [variable_type(table)]
 
-        result = reduce(
-            lambda left, right: pd.merge(
-                left, right, on="GEOID", how="outer", suffixes=("", ".y")
-            ),
-            dat,
-        )
-    else:
+    # If more than one state specified for tracts/block groups take care of
+    # this under the hood by fetching each state separately
+    states = [state]
+    if (geography == "tract" or geography == "block group") and len(state) > 1:
+        logger.info(f"Fetching {geography} data by state and combining the result.")
+        states = [[s] for s in state]
+
+    # We still need to iterate through counties for block groups earlier than 2013
+    counties = [county]
+    if year < 2013 and (geography == "block group" and len(county) > 1):
+        logger.info("Fetching block group data by county and combining the result.")
+        counties = [[c] for c in county]
 
-        result = load_data_acs(
+    def plan_call(chunk, state, county, table=None):
+        formatted = format_variables_acs(chunk, catalog)
+        base, params = build_call_acs(
             geography,
-            format_variables_acs(variables),
-            key,
+            formatted,
             year,
             survey,
             state=state,
@@ -315,77 +206,188 @@ def get_acs(
             zcta=zcta,
             place=place,
             cbsa=cbsa,
-            show_call=show_call,
-            errors=errors,
+            table=table,
         )
+        return ApiCall(base, params, formatted, cache_status(cache, base, params))
+
+    partitions = []
+    for kind in kinds:
+        kind_vars = [var for var in variables if variable_type(var) == kind]
+        if table is not None:
+            kind_vars = variables
+
+        # Handle variable list of any length
+        chunks = [kind_vars[i : i + 24] for i in range(0, len(kind_vars), 24)]
+
+        for state_part in states:
+            for county_part in counties:
+
+                calls = [plan_call(chunk, state_part, county_part) for chunk in chunks]
+
+                # Fetch whole tables in a single call with the API's group()
+                # syntax, falling back to the chunks if that fails
+                fallback = []
+                if table is not None and len(chunks) > 1:
+                    fallback = calls
+                    calls = [plan_call(kind_vars, state_part, county_part, table)]
+
+                partitions.append(
+                    Partition(
+                        kind,
+                        tuple(state_part),
+                        tuple(county_part),
+                        format_variables_acs(kind_vars, catalog).split(","),
+                        calls,
+                        fallback,
+                    )
+                )
 
-    vars2 = format_variables_acs(variables)
-    var_vector = vars2.split(",")
-
-    # Format missing
-    missing = [
-        -111111111,
-        -222222222,
-        -333333333,
-        -444444444,
-        -555555555,
-        -666666666,
-        -777777777,
-        -888888888,
-        -999999999,
-    ]
-    for col in var_vector:
-        result[col] = result[col].replace(missing, np.nan)
-
-    # Re-order it
-    sub = result[["GEOID", "NAME"] + var_vector]
-
-    # Format results
-    if output == "tidy":
-
-        result = (
-            sub.melt(id_vars=["GEOID", "NAME"], var_name="variable")
-            .assign(
-                variable2=lambda df: df["variable"].apply(
-                    lambda x: "estimate" if x.endswith("E") else "moe"
-                ),
-                variable=lambda df: df["variable"].str.slice(0, -1),
-            )
-            .pivot(
-                index=["GEOID", "NAME", "variable"], columns="variable2", values="value"
-            )
-            .reset_index()
-            .rename_axis(None, axis=1)
-        )
+    # Keep the renaming for formatting
+    renamed = None
+    if renamed_variables is not None:
+        renamed = dict(zip(variables, renamed_variables))
+
+    return AcsPlan(
+        geography,
+        year,
+        survey,
+        partitions,
+        output=output,
+        moe_factor=moe_factor,
+        renamed=renamed,
+        annotate_missing=annotate_missing,
+        compact=compact,
+        key=key,
+        show_call=show_call,
+        errors=errors,
+        cache=cache,
+        session=session,
+    )
 
-        if "moe" in result.columns:
-            result["moe"] *= moe_factor
 
-        if renamed_variables is not None:
-            renamed = dict(zip(variables, renamed_variables))
-            result["variable"] = result["variable"].replace(renamed)
+def get_acs(
+    geography,
+    variables=None,
+    table=None,
+    year=2019,
+    output="tidy",
+    state=None,
+    county=None,
+    zcta=None,
+    place=None,
+    cbsa=None,
+    key=None,
+    moe_level=90,
+    survey="acs5",
+    show_call=False,
+    verbose=False,
+    errors="coerce",
+    cache=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    progress=None,
+    session=None,
+    annotate_missing=False,
+    compact=False,
+    explain=False,
+    executor=None,
+):
+    """"""
+    # Set the logging level to warnings or higher
+    if not verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
 
-    elif output == "wide":
+    # Plan the API calls
+    plan = plan_acs(
+        geography,
+        variables=variables,
+        table=table,
+        year=year,
+        output=output,
+        state=state,
+        county=county,
+        zcta=zcta,
+        place=place,
+        cbsa=cbsa,
+        key=key,
+        moe_level=moe_level,
+        survey=survey,
+        show_call=show_call,
+        errors=errors,
+        cache=cache,
+        session=session,
+        annotate_missing=annotate_missing,
+        compact=compact,
+    )
 
-        # Remove duplicate columns
-        result = sub.loc[:, ~sub.columns.duplicated()]
+    # Return the plan without sending anything
+    if explain:
+        return plan
 
-        # Add as MOE
-        moe_vars = [col for col in result if col.endswith("M")]
-        result[moe_vars] *= moe_factor
+    return execute_plan(
+        plan, executor=executor, max_workers=max_workers, progress=progress
+    )
 
-        if renamed_variables is not None:
-            for i, variable in enumerate(variables):
-                sub = result.filter(regex=f"^{variable}", axis=1)
-                new_cols = dict(
-                    zip(
-                        sub.columns,
-                        [
-                            col.replace(variable, renamed_variables[i])
-                            for col in sub.columns
-                        ],
-                    )
-                )
-                result = result.rename(columns=new_cols)
 
-    return result
+def iter_acs(
+    geography,
+    variables=None,
+    table=None,
+    year=2019,
+    output="tidy",
+    state=None,
+    county=None,
+    zcta=None,
+    place=None,
+    cbsa=None,
+    key=None,
+    moe_level=90,
+    survey="acs5",
+    show_call=False,
+    verbose=False,
+    errors="coerce",
+    cache=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    session=None,
+    annotate_missing=False,
+    compact=False,
+    by="state",
+):
+    """
+    Fetch ACS data like :func:`get_acs`, yielding the result in pieces.
+
+    One formatted DataFrame is yielded per partition as soon as it arrives:
+    per state (or county) and table type with ``by="state"``, or also per
+    chunk of variables with ``by="chunk"``. Only a few partitions are in
+    memory at once, and the pieces are not joined, so the variables of a
+    geography can be split across pieces.
+    """
+    # Set the logging level to warnings or higher
+    if not verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    # Plan before the first piece is requested, so bad arguments fail early
+    plan = plan_acs(
+        geography,
+        variables=variables,
+        table=table,
+        year=year,
+        output=output,
+        state=state,
+        county=county,
+        zcta=zcta,
+        place=place,
+        cbsa=cbsa,
+        key=key,
+        moe_level=moe_level,
+        survey=survey,
+        show_call=show_call,
+        errors=errors,
+        cache=cache,
+        session=session,
+        annotate_missing=annotate_missing,
+        compact=compact,
+    )
+
+    return iter_plan(plan, max_workers=max_workers, by=by)
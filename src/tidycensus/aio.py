@@ -0,0 +1,423 @@
+"""Fetch ACS data from asyncio code without blocking the event loop."""
+import asyncio
+import sys
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import partial
+
+from loguru import logger
+
+from . import parallel, retry
+from .acs import plan_acs
+from .cache import request_key
+from .loaders import build_call_acs, read_call_acs
+from .metrics import emit, timed
+from .parallel import DEFAULT_MAX_WORKERS
+from .plan import combine_partitions, format_partition
+from .reshape import compact_dtypes
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# How often the first call waiting for a full limiter checks it again, in
+# seconds, in case a blocking call on another thread freed a slot; calls on
+# the loop wake it up as soon as they finish
+POLL_INTERVAL = 0.01
+POLL_MAX = 0.25
+
+# The calls waiting for each (event loop, limiter), in arrival order
+_waiters = {}
+
+
+def require_httpx():
+    if httpx is None:
+        raise ImportError(
+            "The async API requires httpx; install it with `pip install httpx`."
+        )
+
+
+def client_timeout(timeout=None):
+    # An httpx timeout from a (connect, read) pair, retry.DEFAULT_TIMEOUT by default
+    connect, read = timeout if timeout is not None else retry.DEFAULT_TIMEOUT
+    return httpx.Timeout(read, connect=connect)
+
+
+def create_client(pool_size=None, timeout=None):
+    """
+    Create an ``httpx.AsyncClient`` with connection pooling and keep-alive.
+
+    Like :func:`tidycensus.session.create_session`, the pool defaults to the
+    per-host request limit. ``timeout`` is a ``(connect, read)`` pair in
+    seconds, ``retry.DEFAULT_TIMEOUT`` if None.
+    """
+    require_httpx()
+    if pool_size is None:
+        pool_size = parallel.MAX_REQUESTS_PER_HOST
+
+    limits = httpx.Limits(
+        max_connections=pool_size, max_keepalive_connections=pool_size
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=client_timeout(timeout),
+        headers={"Accept-Encoding": "gzip, deflate"},
+    )
+
+
+@asynccontextmanager
+async def client_for(client):
+    # Use the caller's client, or a new one for the duration of the block
+    if client is not None:
+        yield client
+    else:
+        async with create_client() as client:
+            yield client
+
+
+async def gather_all(aws):
+    """
+    Run awaitables concurrently and return their results in order.
+
+    If one fails, or the caller is cancelled, the others are cancelled.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def acquire(limiter):
+    """
+    Wait for a slot from the host's rate limiter without blocking the loop.
+
+    Calls queue up in arrival order. Only the first in line checks the
+    limiter; it is woken by :func:`release`, and otherwise backs off.
+    """
+    loop = asyncio.get_running_loop()
+    if (loop, limiter) not in _waiters and limiter.try_acquire() == 0:
+        return
+
+    queue = _waiters.setdefault((loop, limiter), deque())
+    event = asyncio.Event()
+    queue.append(event)
+    delay = POLL_INTERVAL
+    try:
+        while True:
+            wait = None
+            if queue[0] is event:
+                wait = limiter.try_acquire()
+                if wait == 0:
+                    return
+                if wait is None:
+                    wait, delay = delay, min(2 * delay, POLL_MAX)
+            event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        queue.remove(event)
+        if len(queue):
+            queue[0].set()
+        else:
+            _waiters.pop((loop, limiter), None)
+
+
+def release(limiter, throttled=False, retry_after=None):
+    """Give a slot back to the limiter, and wake the first call waiting."""
+    limiter.release(throttled=throttled, retry_after=retry_after)
+    queue = _waiters.get((asyncio.get_running_loop(), limiter))
+    if queue:
+        queue[0].set()
+
+
+async def asend_with_retries(client, url, params=None, max_attempts=None, timeout=None):
+    """
+    The async counterpart of :func:`tidycensus.retry.send_with_retries`.
+
+    Each attempt times out after ``timeout``, a ``(connect, read)`` pair in
+    seconds (``retry.DEFAULT_TIMEOUT`` if None).
+
+    Calls share the host's rate limiter with the blocking API, so throttling
+    seen by either slows both down.
+    """
+    if max_attempts is None:
+        max_attempts = retry.DEFAULT_MAX_ATTEMPTS
+    timeout = client_timeout(timeout)
+    limiter = retry.host_limiter(url)
+    start = time.perf_counter()
+
+    for attempt in range(max_attempts):
+        call = error = retry_after = None
+        throttled = False
+
+        await acquire(limiter)
+        try:
+            call = await client.get(url, params=params, timeout=timeout)
+        except httpx.TransportError as e:
+            error = e
+        else:
+            if call.status_code in retry.RETRY_STATUS:
+                throttled = call.status_code in retry.THROTTLE_STATUS
+                retry_after = retry.retry_after_seconds(call.headers.get("Retry-After"))
+        finally:
+            release(limiter, throttled=throttled, retry_after=retry_after)
+
+        if call is not None and call.status_code not in retry.RETRY_STATUS:
+            break
+        if attempt == max_attempts - 1:
+            break
+
+        delay = retry_after if retry_after is not None else retry.backoff_delay(attempt)
+        reason = error if error is not None else f"status {call.status_code}"
+        logger.info(f"Call failed ({reason}). Retrying in {delay:.1f}s...")
+        await asyncio.sleep(delay)
+
+    emit(
+        "http",
+        time.perf_counter() - start,
+        url=url,
+        status=None if call is None else call.status_code,
+        bytes=None if call is None else len(call.content),
+        retries=attempt,
+    )
+    if call is None:
+        raise error
+    return call
+
+
+async def afetch_call_acs(
+    base,
+    params,
+    formatted_variables,
+    key,
+    show_call=False,
+    errors="coerce",
+    cache=None,
+    client=None,
+    executor=None,
+):
+    """
+    The async counterpart of :func:`tidycensus.loaders.fetch_call_acs`.
+
+    Reading the cache and parsing the response run on ``executor`` (the
+    loop's default executor if None).
+    """
+    loop = asyncio.get_running_loop()
+
+    # Check the cache first; ACS releases never change once published
+    if cache is not None:
+        cache_key = request_key(base, params)
+        with timed("cache", url=base) as event:
+            dat = await loop.run_in_executor(executor, cache.get, cache_key)
+            event["cache_hit"] = dat is not None
+        if dat is not None:
+            logger.info(f"Using cached response for {base} ({params['for']})")
+            return dat
+
+    async with client_for(client) as client:
+        call = await asend_with_retries(client, base, params={**params, "key": key})
+
+    dat = await loop.run_in_executor(
+        executor,
+        partial(read_call_acs, call, base, formatted_variables, show_call, errors),
+    )
+
+    if cache is not None:
+        await loop.run_in_executor(executor, cache.set, cache_key, dat)
+
+    return dat
+
+
+async def aload_data_acs(
+    geography,
+    formatted_variables,
+    key,
+    year,
+    survey,
+    state=None,
+    county=None,
+    zcta=None,
+    place=None,
+    cbsa=None,
+    show_call=False,
+    errors="coerce",
+    cache=None,
+    client=None,
+    table=None,
+    executor=None,
+):
+    """The async counterpart of :func:`tidycensus.loaders.load_data_acs`."""
+    base, params = build_call_acs(
+        geography,
+        formatted_variables,
+        year,
+        survey,
+        state=state,
+        county=county,
+        zcta=zcta,
+        place=place,
+        cbsa=cbsa,
+        table=table,
+    )
+    return await afetch_call_acs(
+        base,
+        params,
+        formatted_variables,
+        key,
+        show_call=show_call,
+        errors=errors,
+        cache=cache,
+        client=client,
+        executor=executor,
+    )
+
+
+async def aexecute_plan(
+    plan, client=None, max_workers=DEFAULT_MAX_WORKERS, executor=None
+):
+    """
+    The async counterpart of :func:`tidycensus.plan.execute_plan`.
+
+    Up to ``max_workers`` calls are in flight at once, over one pooled
+    ``client``. Each partition is formatted on ``executor`` as soon as its
+    calls are done, while the others are still being fetched.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(max_workers)
+
+    logger.info(
+        f"Fetching {len(plan.partitions)} partition(s) with {plan.n_calls} "
+        f"API call(s) ({plan.n_cached} cached)."
+    )
+
+    async def run_call(client, call, wrap):
+        async with semaphore:
+            try:
+                return await afetch_call_acs(
+                    call.base,
+                    call.params,
+                    call.variables,
+                    plan.key,
+                    show_call=plan.show_call,
+                    errors=plan.errors,
+                    cache=plan.cache,
+                    client=client,
+                    executor=executor,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not wrap:
+                    raise
+                raise ValueError(
+                    f"Failed to load variables {call.variables}: {e}"
+                ) from e
+
+    async def run_partition(client, partition):
+        wrap = len(partition.calls) > 1
+        try:
+            frames = await gather_all(
+                run_call(client, call, wrap) for call in partition.calls
+            )
+        except ValueError as e:
+            # Group calls that fail are retried as chunks
+            if not len(partition.fallback):
+                raise
+            logger.info(f"Unable to fetch a group; using chunks instead: {e}")
+            frames = await gather_all(
+                run_call(client, call, True) for call in partition.fallback
+            )
+
+        return await loop.run_in_executor(
+            executor, format_partition, plan, partition, frames
+        )
+
+    async with client_for(client) as client:
+        results = await gather_all(
+            run_partition(client, partition) for partition in plan.partitions
+        )
+
+    result = await loop.run_in_executor(executor, combine_partitions, plan, results)
+    if plan.compact:
+        result = await loop.run_in_executor(executor, compact_dtypes, result)
+    return result
+
+
+async def aget_acs(
+    geography,
+    variables=None,
+    table=None,
+    year=2019,
+    output="tidy",
+    state=None,
+    county=None,
+    zcta=None,
+    place=None,
+    cbsa=None,
+    key=None,
+    moe_level=90,
+    survey="acs5",
+    show_call=False,
+    verbose=False,
+    errors="coerce",
+    cache=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    client=None,
+    annotate_missing=False,
+    compact=False,
+    executor=None,
+):
+    """
+    Fetch ACS data like :func:`tidycensus.get_acs`, from asyncio code.
+
+    The calls are sent concurrently with ``httpx`` over one pooled
+    ``client`` (a new ``httpx.AsyncClient`` if None; pass one to share its
+    connections across requests). Planning, parsing and formatting run on
+    ``executor`` (the loop's default executor if None), so the event loop
+    stays responsive. Cancelling the task cancels the calls in flight.
+    """
+    require_httpx()
+
+    # Set the logging level to warnings or higher
+    if not verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    # Planning may download variable catalogs, so it runs off the loop
+    loop = asyncio.get_running_loop()
+    plan = await loop.run_in_executor(
+        executor,
+        partial(
+            plan_acs,
+            geography,
+            variables=variables,
+            table=table,
+            year=year,
+            output=output,
+            state=state,
+            county=county,
+            zcta=zcta,
+            place=place,
+            cbsa=cbsa,
+            key=key,
+            moe_level=moe_level,
+            survey=survey,
+            show_call=show_call,
+            errors=errors,
+            cache=cache,
+            annotate_missing=annotate_missing,
+            compact=compact,
+        ),
+    )
+
+    return await aexecute_plan(
+        plan, client=client, max_workers=max_workers, executor=executor
+    )
@@ -0,0 +1,246 @@
+"""Fetch many ACS requests with as few API calls as possible."""
+import sys
+from functools import partial
+
+from loguru import logger
+
+from .acs import plan_acs, table_survey, variable_type
+from .parallel import DEFAULT_MAX_WORKERS, map_concurrent
+from .plan import combine_partitions, fetch_plan, format_partition
+from .reshape import combine_chunks, compact_dtypes, get_moe_factor
+from .utils import verify_list_inputs
+from .variables import variables_from_table_acs
+
+# The default arguments for a request spec
+SPEC_DEFAULTS = {
+    "variables": None,
+    "table": None,
+    "year": 2019,
+    "output": "tidy",
+    "state": None,
+    "county": None,
+    "zcta": None,
+    "place": None,
+    "cbsa": None,
+    "moe_level": 90,
+    "survey": "acs5",
+    "annotate_missing": False,
+    "compact": False,
+}
+
+
+def normalize_spec(spec, session=None):
+
+    # Fill in the defaults
+    unknown = set(spec) - set(SPEC_DEFAULTS) - {"geography"}
+    if len(unknown):
+        raise ValueError(f"Unknown arguments in batch request: {sorted(unknown)}")
+    if "geography" not in spec:
+        raise ValueError("Every batch request needs a `geography`.")
+    spec = {**SPEC_DEFAULTS, **spec}
+    get_moe_factor(spec["moe_level"])
+
+    # Handle dict variables
+    variables = spec["variables"]
+    renamed = None
+    if isinstance(variables, dict):
+        renamed = {v: k for k, v in variables.items()}
+        variables = list(variables.values())
+    variables = verify_list_inputs(variables)
+
+    # Check inputs for table/variables
+    if not len(variables) and spec["table"] is None:
+        raise ValueError(
+            "Either a vector of variables or an ACS table must be specified."
+        )
+    if len(variables) and spec["table"] is not None:
+        raise ValueError(
+            "Specify variables or a table to retrieve; they cannot be combined."
+        )
+
+    # Expand tables into their variables
+    if spec["table"] is not None:
+        variables = variables_from_table_acs(
+            spec["table"],
+            spec["year"],
+            table_survey(spec["table"], spec["survey"]),
+            session=session,
+        )
+
+    # Remove E or M if given and drop duplicates
+    variables = list(
+        dict.fromkeys(v[:-1] if v[-1] in ["E", "M"] else v for v in variables)
+    )
+    if renamed is not None:
+        renamed = {
+            (v[:-1] if v[-1] in ["E", "M"] else v): name for v, name in renamed.items()
+        }
+
+    # Geographies are part of the group key, so make them hashable
+    for name in ["state", "county", "zcta", "place", "cbsa"]:
+        spec[name] = tuple(verify_list_inputs(spec[name]))
+
+    spec["variables"] = variables
+    spec["renamed"] = renamed
+    return spec
+
+
+def group_key(spec, kind):
+    # Whole tables are fetched with their own group() call, so specs asking
+    # for a table only share it with specs asking for the same table
+    return (
+        spec["geography"],
+        spec["year"],
+        spec["survey"],
+        kind,
+        spec["table"],
+        spec["state"],
+        spec["county"],
+        spec["zcta"],
+        spec["place"],
+        spec["cbsa"],
+    )
+
+
+def spec_plan(spec, key, session=None):
+    # The plan get_acs would make for a spec; it only formats the output
+    variables = spec["variables"]
+    if spec["table"] is not None:
+        variables = None
+    elif spec["renamed"] is not None:
+        variables = {spec["renamed"].get(v, v): v for v in variables}
+    return plan_acs(
+        spec["geography"],
+        variables=variables,
+        table=spec["table"],
+        year=spec["year"],
+        output=spec["output"],
+        state=list(spec["state"]),
+        county=list(spec["county"]),
+        zcta=list(spec["zcta"]),
+        place=list(spec["place"]),
+        cbsa=list(spec["cbsa"]),
+        key=key,
+        moe_level=spec["moe_level"],
+        survey=spec["survey"],
+        session=session,
+        annotate_missing=spec["annotate_missing"],
+        compact=spec["compact"],
+    )
+
+
+def partition_key(partition):
+    return partition.kind, tuple(partition.state), tuple(partition.county)
+
+
+def plan_batch(specs, session=None):
+    """
+    Group request specs into the fewest distinct fetches.
+
+    Returns the normalized specs and a dict mapping each group key (geography,
+    year, survey, table type, table and the geographic filters) to the union
+    of the variables every spec in the group needs, in order.
+    """
+    specs = [normalize_spec(spec, session=session) for spec in specs]
+
+    groups = {}
+    for spec in specs:
+        for variable in spec["variables"]:
+            key = group_key(spec, variable_type(variable))
+            groups.setdefault(key, {})[variable] = None
+
+    return specs, groups
+
+
+def get_acs_batch(
+    specs,
+    key=None,
+    show_call=False,
+    verbose=False,
+    errors="coerce",
+    cache=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    session=None,
+):
+    """
+    Fetch many ``get_acs`` requests at once.
+
+    Each spec is a dict of ``get_acs`` arguments (``geography``,
+    ``variables`` or ``table``, ``year``, ``output``, ``state``, ``county``,
+    ``zcta``, ``place``, ``cbsa``, ``moe_level``, ``survey``,
+    ``annotate_missing`` and ``compact``). The variables of every spec
+    sharing a geography, year, survey and table type are merged so they are
+    downloaded once, in full 24-variable chunks; a ``table`` is downloaded
+    once with a single group() call. The merged requests run concurrently.
+    The raw results are then split back out and formatted with each spec's
+    own plan, so the list returned holds exactly what
+    ``get_acs`` would return for each spec.
+    """
+    # Set the logging level to warnings or higher
+    if not verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    specs, groups = plan_batch(specs, session=session)
+
+    # Plan the merged requests, and each spec on its own
+    merged = {}
+    for group_id, group in groups.items():
+        geography, year, survey, _, table = group_id[:5]
+        state, county, zcta, place, cbsa = group_id[5:]
+        merged[group_id] = plan_acs(
+            geography,
+            variables=list(group) if table is None else None,
+            table=table,
+            year=year,
+            output="wide",
+            state=list(state),
+            county=list(county),
+            zcta=list(zcta),
+            place=list(place),
+            cbsa=list(cbsa),
+            key=key,
+            survey=survey,
+            show_call=show_call,
+            errors=errors,
+            cache=cache,
+            session=session,
+        )
+    plans = [spec_plan(spec, key, session) for spec in specs]
+
+    logger.info(
+        f"Fetching {len(specs)} requests with {len(groups)} merged requests "
+        f"({sum(plan.n_calls for plan in merged.values())} API calls)."
+    )
+
+    # Fetch the raw, parsed chunks of every merged request
+    executor = partial(map_concurrent, max_workers=max_workers, label="calls")
+    fetched = map_concurrent(
+        lambda plan: fetch_plan(plan, executor),
+        list(merged.values()),
+        max_workers=max_workers,
+    )
+
+    # Index the raw results by group and partition
+    raw = {}
+    for group_id, plan, frames in zip(merged, merged.values(), fetched):
+        for partition, dat in zip(plan.partitions, frames):
+            raw[group_id, partition_key(partition)] = combine_chunks(dat)
+
+    # Split the results back out and format them as get_acs would
+    out = []
+    for spec, plan in zip(specs, plans):
+        results = []
+        for partition in plan.partitions:
+            dat = raw[group_key(spec, partition.kind), partition_key(partition)]
+            cols = [col for col in partition.var_vector if col in dat.columns]
+            results.append(
+                format_partition(plan, partition, [dat[["GEOID", "NAME"] + cols]])
+            )
+        result = combine_partitions(plan, results)
+
+        if plan.compact:
+            result = compact_dtypes(result)
+        out.append(result)
+
+    return out
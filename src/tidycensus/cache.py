@@ -0,0 +1,190 @@
+"""On-disk cache for parsed Census API responses."""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+# Where cached responses live unless told otherwise
+DEFAULT_CACHE_DIR = Path(
+    os.getenv(
+        "TIDYCENSUS_CACHE_DIR",
+        Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "tidycensus",
+    )
+)
+
+# 1 GB
+DEFAULT_MAX_BYTES = 2 ** 30
+
+
+def request_key(base, params):
+    """
+    Build a cache key for a Census API call.
+
+    The key depends on the endpoint (year and survey), the sorted list of
+    requested variables and the ``for``/``in`` clauses. The API key is never
+    part of it.
+    """
+    normalized = {
+        "base": base,
+        "get": sorted(params.get("get", "").split(",")),
+        "for": params.get("for"),
+        "in": params.get("in"),
+    }
+    blob = json.dumps(normalized, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class DiskCache:
+    """
+    Store parsed API results on local disk.
+
+    Entries older than ``ttl`` seconds are treated as missing (``None`` means
+    they never expire). When the cache grows past ``max_bytes``, the least
+    recently used entries are evicted first.
+    """
+
+    suffix = ".pkl"
+
+    def __init__(self, path=None, ttl=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path) if path is not None else DEFAULT_CACHE_DIR
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    def __repr__(self):
+        return (
+            f"DiskCache(path='{self.path}', ttl={self.ttl}, max_bytes={self.max_bytes})"
+        )
+
+    def _entry(self, key):
+        return self.path / f"{key}{self.suffix}"
+
+    def __contains__(self, key):
+        """Whether ``key`` has an unexpired entry, without loading it."""
+        try:
+            stat = self._entry(key).stat()
+        except FileNotFoundError:
+            return False
+
+        # Entries are never rewritten in place, so mtime is the creation time
+        return self.ttl is None or time.time() - stat.st_mtime <= self.ttl
+
+    def get(self, key):
+        """Return the cached value for ``key``, or ``None`` on a miss."""
+        entry = self._entry(key)
+        try:
+            with open(entry, "rb") as ff:
+                created, value = pickle.load(ff)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Anything unreadable (truncated, malformed or pickled by an
+            # incompatible version) is dropped and treated as a miss
+            logger.warning(f"Dropping unreadable cache entry {entry.name}: {e!r}")
+            self.delete(key)
+            return None
+
+        # Expired
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self.delete(key)
+            return None
+
+        # Touch the access time so eviction is least recently used; the
+        # modification time is left as the creation time
+        try:
+            os.utime(entry, (time.time(), entry.stat().st_mtime))
+        except FileNotFoundError:
+            pass
+
+        return value
+
+    def set(self, key, value):
+        """Store ``value`` under ``key`` and evict old entries if needed."""
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary file first so readers never see partial entries
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as ff:
+                pickle.dump((time.time(), value), ff, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._entry(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        self.evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._entry(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Remove every entry from the cache."""
+        for entry in self.path.glob(f"*{self.suffix}"):
+            try:
+                os.remove(entry)
+            except FileNotFoundError:
+                pass
+
+    def size(self):
+        """The total size of all cache entries in bytes."""
+        total = 0
+        for entry in self.path.glob(f"*{self.suffix}"):
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits ``max_bytes``."""
+        if self.max_bytes is None:
+            return
+
+        entries = []
+        for entry in self.path.glob(f"*{self.suffix}"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda x: x[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry)
+                logger.debug(f"Evicted cache entry {entry.name}")
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+_default_cache = None
+
+
+def resolve_cache(cache):
+    """
+    Turn the ``cache`` argument of ``get_acs`` into a cache object.
+
+    ``False``/``None`` disables caching, ``True`` uses a process-wide
+    :class:`DiskCache` in the default location, and anything else is assumed
+    to implement ``get(key)`` and ``set(key, value)``.
+    """
+    global _default_cache
+
+    if cache is None or cache is False:
+        return None
+    if cache is True:
+        if _default_cache is None:
+            _default_cache = DiskCache()
+        return _default_cache
+    return cache
@@ -0,0 +1,144 @@
+"""Structured timing and size metrics for each stage of a request."""
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# One measurement of one stage: "http" (one API call, including retries),
+# "cache" (a lookup), "parse", "clean" (missing values), "combine" (joining
+# chunks or partitions) or "reshape" (formatting the output). Fields that
+# don't apply to a stage are None.
+MetricEvent = namedtuple(
+    "MetricEvent",
+    [
+        "stage",
+        "elapsed",
+        "url",
+        "status",
+        "bytes",
+        "rows",
+        "columns",
+        "cache_hit",
+        "retries",
+        "time",
+    ],
+    defaults=[None] * 8,
+)
+
+# The registered hooks; the list is replaced, never changed in place, so it
+# can be read without the lock
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def add_metrics_hook(hook):
+    """
+    Call ``hook(event)`` with a :data:`MetricEvent` for every stage of every
+    request, from whichever thread ran the stage. Returns ``hook``.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + [hook]
+    return hook
+
+
+def remove_metrics_hook(hook):
+    """Stop calling ``hook``."""
+    global _hooks
+    with _hooks_lock:
+        _hooks = [h for h in _hooks if h is not hook]
+
+
+def emit(stage, elapsed=0.0, **fields):
+    """Send an event to the registered hooks, if there are any."""
+    hooks = _hooks
+    if not len(hooks):
+        return
+    event = MetricEvent(stage, elapsed, time=time.time(), **fields)
+    for hook in hooks:
+        hook(event)
+
+
+@contextmanager
+def timed(stage, **fields):
+    """
+    Time the body of the ``with`` statement and emit it as ``stage``.
+
+    Yields the dict of event fields, so sizes known only at the end (e.g.
+    the number of rows) can be added to it.
+    """
+    start = time.perf_counter()
+    yield fields
+    emit(stage, time.perf_counter() - start, **fields)
+
+
+class MetricsCollector:
+    """
+    Collect metric events and summarize them by stage.
+
+    Use it as a hook, or as a context manager that registers it for the
+    duration of the block::
+
+        with MetricsCollector() as metrics:
+            get_acs(...)
+        metrics.summary()
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def __enter__(self):
+        add_metrics_hook(self)
+        return self
+
+    def __exit__(self, *exc):
+        remove_metrics_hook(self)
+
+    def __repr__(self):
+        return f"MetricsCollector(events={len(self.events)})"
+
+    def summary(self):
+        """
+        Totals by stage: the number of events, the total and maximum elapsed
+        seconds, the bytes and rows handled, cache hits and misses, and
+        retries.
+        """
+        with self._lock:
+            events = list(self.events)
+
+        summary = {}
+        for event in events:
+            stage = summary.setdefault(
+                event.stage,
+                {
+                    "count": 0,
+                    "elapsed": 0.0,
+                    "max_elapsed": 0.0,
+                    "bytes": 0,
+                    "rows": 0,
+                    "cache_hits": 0,
+                    "cache_misses": 0,
+                    "retries": 0,
+                },
+            )
+            stage["count"] += 1
+            stage["elapsed"] += event.elapsed
+            stage["max_elapsed"] = max(stage["max_elapsed"], event.elapsed)
+            stage["bytes"] += event.bytes or 0
+            stage["rows"] += event.rows or 0
+            stage["retries"] += event.retries or 0
+            if event.cache_hit is not None:
+                stage["cache_hits" if event.cache_hit else "cache_misses"] += 1
+        return summary
+
+    def to_frame(self):
+        """The events as a DataFrame, one row per event."""
+        import pandas as pd
+
+        with self._lock:
+            return pd.DataFrame(list(self.events), columns=MetricEvent._fields)
@@ -0,0 +1,171 @@
+"""Fetch the same ACS request for several years at once."""
+import sys
+
+import pandas as pd
+from loguru import logger
+
+from .acs import plan_acs, table_survey
+from .cache import resolve_cache
+from .parallel import DEFAULT_MAX_WORKERS, map_concurrent
+from .plan import execute_plan
+from .reshape import combine_chunks, compact_dtypes
+from .variables import load_variables_acs
+
+
+def available_variables(variables, year, survey, session=None):
+    """
+    Split ``variables`` into those published for ``year`` and those that
+    are not, according to the variable catalogs.
+    """
+    found, missing = [], []
+    for variable in variables:
+        stem = variable[:-1] if variable[-1] in ["E", "M"] else variable
+        catalog = load_variables_acs(year, table_survey(stem, survey), session=session)
+        if stem in catalog.variables:
+            found.append(variable)
+        else:
+            missing.append(variable)
+    return found, missing
+
+
+def get_acs_panel(
+    geography,
+    years,
+    variables=None,
+    table=None,
+    output="tidy",
+    layout="long",
+    state=None,
+    county=None,
+    zcta=None,
+    place=None,
+    cbsa=None,
+    key=None,
+    moe_level=90,
+    survey="acs5",
+    show_call=False,
+    verbose=False,
+    errors="coerce",
+    cache=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    session=None,
+    annotate_missing=False,
+    compact=False,
+):
+    """
+    Fetch an ACS request for each of ``years`` and combine them in a panel.
+
+    Takes the arguments of :func:`~tidycensus.get_acs`, with a list of
+    ``years`` instead of one. The variable catalog of each year is checked
+    first: variables a year doesn't publish are dropped for that year (with
+    a warning), and years with none of the variables (or without ``table``)
+    are skipped. The years are then fetched concurrently with one session
+    and cache.
+
+    With ``layout="long"``, the results are stacked with a ``year`` column.
+    With ``layout="wide"``, there is one row per GEOID and the wide columns
+    of each year are suffixed with it (e.g. ``B01001_001E_2019``).
+    """
+    # Set the logging level to warnings or higher
+    if not verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    # Check inputs
+    if layout not in ["long", "wide"]:
+        raise ValueError("`layout` must be one of 'long' or 'wide'.")
+    if layout == "wide":
+        output = "wide"
+    years = sorted(set(int(year) for year in years))
+    if not len(years):
+        raise ValueError("At least one year must be specified.")
+
+    # Share one cache between the years
+    cache = resolve_cache(cache)
+
+    # Handle dict variables
+    renamed = None
+    if isinstance(variables, dict):
+        renamed = {v: k for k, v in variables.items()}
+        variables = list(variables.values())
+    elif isinstance(variables, str):
+        variables = [variables]
+
+    # Check which variables each year has, loading the catalogs concurrently
+    def check(year):
+        if table is not None:
+            catalog = load_variables_acs(
+                year, table_survey(table, survey), session=session
+            )
+            return (None, []) if table in catalog.tables else ([], [table])
+        return available_variables(variables, year, survey, session=session)
+
+    checks = map_concurrent(check, years, max_workers=max_workers)
+
+    plans = {}
+    for year, (found, missing) in zip(years, checks):
+        if len(missing):
+            logger.warning(f"Not available in the {year} ACS: {', '.join(missing)}")
+        if found is not None and not len(found):
+            logger.warning(f"Skipping {year}: none of the requested data is available.")
+            continue
+
+        if renamed is not None:
+            found = {renamed[v]: v for v in found}
+        plans[year] = plan_acs(
+            geography,
+            variables=found,
+            table=table,
+            year=year,
+            output=output,
+            state=state,
+            county=county,
+            zcta=zcta,
+            place=place,
+            cbsa=cbsa,
+            key=key,
+            moe_level=moe_level,
+            survey=survey,
+            show_call=show_call,
+            errors=errors,
+            cache=cache,
+            session=session,
+            annotate_missing=annotate_missing,
+        )
+
+    if not len(plans):
+        raise ValueError(
+            "None of the requested data is available in the requested years."
+        )
+
+    # Fetch the years concurrently
+    logger.info(f"Fetching {len(plans)} years of ACS data.")
+    results = map_concurrent(
+        lambda year: execute_plan(plans[year], max_workers=max_workers),
+        plans,
+        max_workers=max_workers,
+        label="years",
+    )
+
+    # Combine the years
+    if layout == "long":
+        for year, dat in zip(plans, results):
+            dat.insert(0, "year", year)
+        result = pd.concat(results, ignore_index=True)
+    else:
+        frames = []
+        for year, dat in zip(plans, results):
+            frames.append(
+                dat.rename(
+                    columns={
+                        col: f"{col}_{year}"
+                        for col in dat.columns
+                        if col not in ["GEOID", "NAME"]
+                    }
+                )
+            )
+        result = combine_chunks(frames)
+
+    if compact:
+        result = compact_dtypes(result)
+    return result
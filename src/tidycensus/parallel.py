@@ -0,0 +1,81 @@
+"""Run Census API calls concurrently."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+# The default size of the worker pool
+DEFAULT_MAX_WORKERS = 8
+
+# The maximum number of simultaneous requests sent to a single host, no matter
+# how many worker pools are active (e.g. years fanning out into states); see
+# tidycensus.retry.RateLimiter
+MAX_REQUESTS_PER_HOST = 8
+
+_host_lock = threading.Lock()
+
+
+def set_host_limit(limit):
+    """Change the maximum number of concurrent requests per host."""
+    global MAX_REQUESTS_PER_HOST
+
+    if limit < 1:
+        raise ValueError("The per-host request limit must be at least 1.")
+
+    with _host_lock:
+        MAX_REQUESTS_PER_HOST = limit
+
+
+def map_concurrent(
+    func, items, max_workers=DEFAULT_MAX_WORKERS, progress=None, label=None
+):
+    """
+    Apply ``func`` to each of ``items`` on a bounded thread pool.
+
+    Results are returned in the order of ``items``. If any call fails, the
+    calls that have not started yet are cancelled and the first error (in
+    item order) is raised.
+
+    ``progress`` is called as ``progress(done, total)`` each time an item
+    finishes. If it is not given and ``label`` is, progress is logged instead.
+    """
+    items = list(items)
+    total = len(items)
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS
+
+    done = 0
+    lock = threading.Lock()
+
+    def report():
+        nonlocal done
+        with lock:
+            done += 1
+            n = done
+        if progress is not None:
+            progress(n, total)
+        elif label is not None:
+            logger.info(f"Finished {n}/{total} {label}")
+
+    def on_done(future):
+        if not future.cancelled() and future.exception() is None:
+            report()
+
+    # Nothing to gain from a pool
+    if max_workers <= 1 or total <= 1:
+        results = []
+        for item in items:
+            results.append(func(item))
+            report()
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, total)) as pool:
+        futures = [pool.submit(func, item) for item in items]
+        for future in futures:
+            future.add_done_callback(on_done)
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
@@ -0,0 +1,165 @@
+"""Parse Census API responses into DataFrames."""
+import numpy as np
+import pandas as pd
+
+# Use a faster JSON decoder when one is installed
+try:
+    from orjson import loads
+except ImportError:
+    from json import loads
+
+# The codes the Census uses in place of estimates and MOEs that are missing or
+# could not be computed
+MISSING_VALUES = [
+    -111111111,
+    -222222222,
+    -333333333,
+    -444444444,
+    -555555555,
+    -666666666,
+    -777777777,
+    -888888888,
+    -999999999,
+]
+
+# The geographic hierarchy, from largest to smallest, used to order the
+# pieces of a GEOID
+GEOGRAPHY_ORDER = [
+    "us",
+    "region",
+    "division",
+    "combined statistical area",
+    "metropolitan statistical area/micropolitan statistical area",
+    "metropolitan division",
+    "state",
+    "congressional district",
+    "state legislative district (upper chamber)",
+    "state legislative district (lower chamber)",
+    "county",
+    "county subdivision",
+    "place",
+    "tract",
+    "block group",
+    "public use microdata area",
+    "school district (elementary)",
+    "school district (secondary)",
+    "school district (unified)",
+    "zip code tabulation area",
+]
+
+
+def build_geoid(dat, id_vars):
+
+    # Order the ID columns by the hierarchy (unknown columns keep their order)
+    rank = {geo: i for i, geo in enumerate(GEOGRAPHY_ORDER)}
+    id_vars = sorted(id_vars, key=lambda col: rank.get(col, len(rank)))
+
+    # Concatenate column-wise rather than row by row
+    parts = [dat[col].astype(str) for col in id_vars]
+    if not len(parts):
+        return pd.Series("", index=dat.index)
+    if len(parts) == 1:
+        return parts[0]
+    return parts[0].str.cat(parts[1:])
+
+
+def missing_mask(values):
+    """Flag the Census missing value codes in a numeric array."""
+    return np.isin(values, MISSING_VALUES)
+
+
+def replace_missing(dat, columns, annotate=False):
+    """
+    Replace the Census missing value codes in ``columns`` with NaN.
+
+    All of the columns are masked in one operation over a single numeric
+    block. With ``annotate``, a frame holding the codes that were replaced
+    (NaN everywhere else) is returned too; otherwise the second value is
+    ``None``.
+    """
+    values = dat[columns].to_numpy(dtype=np.float64, copy=True)
+    mask = missing_mask(values)
+
+    codes = None
+    if annotate:
+        codes = pd.DataFrame(
+            np.where(mask, values, np.nan), columns=columns, index=dat.index
+        )
+
+    values[mask] = np.nan
+
+    # Swap in the masked block whole; assigning the columns one at a time
+    # would fragment the frame
+    masked = pd.DataFrame(values, columns=columns, index=dat.index)
+    others = dat.drop(columns=columns)
+    dat = pd.concat([others, masked], axis=1)[list(dat.columns)]
+
+    return dat, codes
+
+
+def annotation_codes(codes):
+    """Turn replaced missing value codes into a categorical."""
+    return pd.Categorical(codes, categories=MISSING_VALUES)
+
+
+def parse_response(content, variables, errors="coerce"):
+    """
+    Parse the list-of-lists JSON returned by the Census API.
+
+    The first row holds the column names. Columns are built directly from the
+    rows, all of ``variables`` are converted to numbers in one pass, and the
+    geography ID columns are replaced by a single GEOID column. Other columns
+    that were not requested are dropped. Missing value codes are left for
+    :func:`replace_missing`.
+    """
+    rows = loads(content)
+    header, body = rows[0], rows[1:]
+
+    # The geography ID variables are the lowercase columns ("state", "tract",
+    # ...); anything else that wasn't requested (e.g. the annotation columns
+    # returned for group() queries) is dropped
+    v2 = set(variables) | {"NAME"}
+    id_vars = [col for col in dict.fromkeys(header) if col not in v2 and col.islower()]
+
+    # Keep the first occurrence of each column we need
+    position = {}
+    for i, col in enumerate(header):
+        if col in v2 or col in id_vars:
+            position.setdefault(col, i)
+
+    missing = [v for v in variables if v not in position]
+    if len(missing):
+        raise ValueError(f"The API response is missing the variables {missing}.")
+
+    # All the values as a 2D object array
+    if len(body):
+        values = np.array(body, dtype=object)
+    else:
+        values = np.empty((0, len(header)), dtype=object)
+
+    # Convert all estimates/MOEs at once
+    numeric = values[:, [position[v] for v in variables]]
+    try:
+        numeric = numeric.astype(np.float64)
+    except (TypeError, ValueError):
+        numeric = (
+            pd.to_numeric(pd.Series(numeric.ravel()), errors=errors)
+            .to_numpy(dtype=np.float64, copy=True)
+            .reshape(numeric.shape)
+        )
+
+    # Build the frame column by column, in the order of the header
+    numeric_index = {v: j for j, v in enumerate(variables)}
+    columns = {}
+    for col, i in position.items():
+        if col in numeric_index:
+            columns[col] = numeric[:, numeric_index[col]]
+        else:
+            columns[col] = values[:, i]
+    dat = pd.DataFrame(columns)
+
+    # Paste into a GEOID column
+    dat["GEOID"] = build_geoid(dat, id_vars)
+
+    # Now, remove them
+    return dat.drop(labels=id_vars, axis=1)
@@ -0,0 +1,407 @@
+"""Explicit plans of the Census API calls behind a request."""
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+import pandas as pd
+from loguru import logger
+
+from .cache import request_key
+from .loaders import fetch_call_acs
+from .metrics import timed
+from .parallel import DEFAULT_MAX_WORKERS, map_concurrent
+from .parsers import replace_missing
+from .reshape import combine_chunks, compact_dtypes, format_acs
+
+# A single API call: the endpoint, the get/for/in parameters, the formatted
+# variables kept from the response and whether the response is already cached
+# (None if the cache can't tell)
+ApiCall = namedtuple("ApiCall", ["base", "params", "variables", "cached"])
+
+# A piece of a request that is fetched and formatted on its own: one table
+# type ("B", "S", "DP" or "K") for one set of states and counties. If the
+# calls fetch a whole table with group(), the fallback calls fetch the same
+# variables in chunks.
+Partition = namedtuple(
+    "Partition", ["kind", "state", "county", "var_vector", "calls", "fallback"]
+)
+
+
+def cache_status(cache, base, params):
+
+    # Check for a cached response without loading it
+    if cache is None:
+        return False
+    try:
+        return request_key(base, params) in cache
+    except TypeError:
+        return None
+
+
+class AcsPlan:
+    """
+    The API calls needed to answer a ``get_acs`` request.
+
+    The plan is built without sending anything. ``partitions`` lists the
+    pieces of the request, each with its API calls; :meth:`explain`
+    describes them and :func:`execute_plan` (or ``get_acs``) runs them.
+    """
+
+    def __init__(
+        self,
+        geography,
+        year,
+        survey,
+        partitions,
+        output="tidy",
+        moe_factor=1,
+        renamed=None,
+        annotate_missing=False,
+        compact=False,
+        key=None,
+        show_call=False,
+        errors="coerce",
+        cache=None,
+        session=None,
+    ):
+        self.geography = geography
+        self.year = year
+        self.survey = survey
+        self.partitions = partitions
+        self.output = output
+        self.moe_factor = moe_factor
+        self.renamed = renamed
+        self.annotate_missing = annotate_missing
+        self.compact = compact
+        self.key = key
+        self.show_call = show_call
+        self.errors = errors
+        self.cache = cache
+        self.session = session
+
+    def __repr__(self):
+        return (
+            f"AcsPlan(geography='{self.geography}', year={self.year}, "
+            f"survey='{self.survey}', partitions={len(self.partitions)}, "
+            f"calls={self.n_calls}, cached={self.n_cached})"
+        )
+
+    def __str__(self):
+        return self.explain()
+
+    @property
+    def calls(self):
+        """Every API call in the plan, in order."""
+        return [call for partition in self.partitions for call in partition.calls]
+
+    @property
+    def n_calls(self):
+        """The number of API calls the plan expects to make."""
+        return len(self.calls)
+
+    @property
+    def n_cached(self):
+        """The number of calls that will be answered from the cache."""
+        return sum(call.cached is True for call in self.calls)
+
+    def explain(self):
+        """Describe the plan, one line per API call."""
+        lines = [
+            f"ACS plan: {self.geography} from the {self.year} {self.survey} "
+            f"({self.output} output)",
+            f"{len(self.partitions)} partition(s), {self.n_calls} API call(s), "
+            f"{self.n_cached} cached",
+        ]
+        for partition in self.partitions:
+            label = [f"type={partition.kind}"]
+            if len(partition.state):
+                label.append(f"state={','.join(partition.state)}")
+            if len(partition.county):
+                label.append(f"county={','.join(partition.county)}")
+            # var_vector holds the E and M columns; count the variables
+            n_variables = len(dict.fromkeys(col[:-1] for col in partition.var_vector))
+            lines.append(f"[{' '.join(label)}] {n_variables} variables")
+            for call in partition.calls:
+                lines.append("  " + describe_call(call))
+            if len(partition.fallback):
+                lines.append(
+                    f"  (falls back to {len(partition.fallback)} chunked call(s) "
+                    "if the group call fails)"
+                )
+        return "\n".join(lines)
+
+
+def describe_call(call):
+    params = "&".join(f"{k}={v}" for k, v in call.params.items())
+    status = {True: " [cached]", None: " [cache unknown]"}.get(call.cached, "")
+    return f"{call.base}?{params}{status}"
+
+
+def run_call(plan, call, wrap=False):
+
+    # Fetch and parse a single call
+    try:
+        return fetch_call_acs(
+            call.base,
+            call.params,
+            call.variables,
+            plan.key,
+            show_call=plan.show_call,
+            errors=plan.errors,
+            cache=plan.cache,
+            session=plan.session,
+        )
+    except Exception as e:
+        if not wrap:
+            raise
+        raise ValueError(f"Failed to load variables {call.variables}: {e}") from e
+
+
+def run_unit(plan, unit):
+    # A unit is (partition number, call number); chunks of a partition report
+    # which variables failed
+    i, j = unit
+    partition = plan.partitions[i]
+    return run_call(plan, partition.calls[j], wrap=len(partition.calls) > 1)
+
+
+def run_fallback(plan, unit):
+    i, j = unit
+    return run_call(plan, plan.partitions[i].fallback[j], wrap=True)
+
+
+def map_with(executor, func, items):
+
+    # Executors are either concurrent.futures-style objects or callables
+    if hasattr(executor, "map"):
+        return list(executor.map(func, items))
+    return list(executor(func, items))
+
+
+def fetch_plan(plan, executor):
+    """
+    Fetch the raw results for every partition of ``plan``.
+
+    Returns one list of parsed frames per partition. Group calls that fail
+    are replaced by their chunked fallback calls, in a second round.
+    """
+    units = [
+        (i, j)
+        for i, partition in enumerate(plan.partitions)
+        for j in range(len(partition.calls))
+    ]
+
+    # Group calls that fail are retried as chunks
+    def attempt(unit):
+        partition = plan.partitions[unit[0]]
+        try:
+            return run_unit(plan, unit)
+        except ValueError as e:
+            if not len(partition.fallback):
+                raise
+            logger.info(f"Unable to fetch a group; using chunks instead: {e}")
+            return None
+
+    frames = [[] for _ in plan.partitions]
+    failed = []
+    for (i, _), dat in zip(units, map_with(executor, attempt, units)):
+        if dat is None:
+            failed.append(i)
+        else:
+            frames[i].append(dat)
+
+    if len(failed):
+        units = [
+            (i, j) for i in failed for j in range(len(plan.partitions[i].fallback))
+        ]
+        for (i, _), dat in zip(
+            units, map_with(executor, partial(run_fallback, plan), units)
+        ):
+            frames[i].append(dat)
+
+    return frames
+
+
+def format_partition(plan, partition, frames):
+    """Combine the chunks of a partition and format them for output."""
+    with timed("combine") as event:
+        dat = combine_chunks(frames)
+        event["rows"], event["columns"] = dat.shape
+
+    # Format missing, in one pass over all of the variables
+    with timed("clean", rows=len(dat), columns=dat.shape[1]):
+        dat, codes = replace_missing(
+            dat, partition.var_vector, annotate=plan.annotate_missing
+        )
+
+    with timed("reshape") as event:
+        dat = format_acs(
+            dat,
+            partition.var_vector,
+            output=plan.output,
+            moe_factor=plan.moe_factor,
+            codes=codes,
+            renamed=plan.renamed,
+        )
+        event["rows"], event["columns"] = dat.shape
+    return dat
+
+
+def combine_partitions(plan, results):
+    """
+    Combine the formatted partitions into the final result.
+
+    Partitions of the same table type cover different geographies, so their
+    rows are stacked. Different table types cover the same geographies: wide
+    results are joined on GEOID, and tidy results are stacked and sorted so
+    that all of the variables for each GEOID are together.
+    """
+    by_kind = {}
+    for partition, result in zip(plan.partitions, results):
+        by_kind.setdefault(partition.kind, []).append(result)
+
+    with timed("combine") as event:
+        frames = [
+            pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+            for parts in by_kind.values()
+        ]
+        if len(frames) == 1:
+            dat = frames[0]
+        elif plan.output != "tidy":
+            dat = combine_chunks(frames)
+        else:
+            dat = pd.concat(frames, ignore_index=True).sort_values(
+                "GEOID", kind="stable", ignore_index=True
+            )
+        event["rows"], event["columns"] = dat.shape
+    return dat
+
+
+def execute_plan(plan, executor=None, max_workers=DEFAULT_MAX_WORKERS, progress=None):
+    """
+    Run the API calls of ``plan`` and return the combined result.
+
+    ``executor`` runs the calls: either a ``concurrent.futures`` executor (or
+    anything else with a ``map(func, items)`` method) or a callable
+    ``executor(func, items)`` returning the results in order. By default the
+    calls run on a thread pool of ``max_workers`` threads, and ``progress``
+    is called as ``progress(done, total)`` as each call finishes.
+    """
+    if executor is None:
+        executor = partial(
+            map_concurrent, max_workers=max_workers, progress=progress, label="calls"
+        )
+
+    logger.info(
+        f"Fetching {len(plan.partitions)} partition(s) with {plan.n_calls} "
+        f"API call(s) ({plan.n_cached} cached)."
+    )
+    frames = fetch_plan(plan, executor)
+
+    results = [
+        format_partition(plan, partition, dat)
+        for partition, dat in zip(plan.partitions, frames)
+    ]
+    result = combine_partitions(plan, results)
+
+    if plan.compact:
+        result = compact_dtypes(result)
+    return result
+
+
+def split_chunks(plan):
+    """
+    Split the partitions of ``plan`` into one partition per variable chunk.
+
+    Whole tables are fetched in chunks rather than with a single group call,
+    so that no partition is larger than one chunk.
+    """
+    partitions = []
+    for partition in plan.partitions:
+        calls = partition.fallback if len(partition.fallback) else partition.calls
+        for call in calls:
+            partitions.append(
+                partition._replace(
+                    var_vector=call.variables.split(","), calls=[call], fallback=[]
+                )
+            )
+    return partitions
+
+
+def iter_partitions(plan, max_workers=DEFAULT_MAX_WORKERS, by="state"):
+    """
+    Run the API calls of ``plan``, yielding each partition once it is done.
+
+    Yields ``(number, partition, result)`` tuples, where ``number`` is the
+    position of the partition in the plan.
+
+    With ``by="state"``, one formatted DataFrame is yielded per partition of
+    the plan (a state or county, and a table type). With ``by="chunk"``, the
+    partitions are further split into their variable chunks. Partitions are
+    yielded in the order they finish, and at most ``max_workers`` calls are
+    in flight at any time, so only a few partitions are held in memory.
+    """
+    if by == "state":
+        partitions = plan.partitions
+    elif by == "chunk":
+        partitions = split_chunks(plan)
+    else:
+        raise ValueError("`by` must be one of 'state' or 'chunk'.")
+    if max_workers is None or max_workers < 1:
+        max_workers = 1
+
+    queue = deque(
+        (i, call, len(partition.calls) > 1)
+        for i, partition in enumerate(partitions)
+        for call in partition.calls
+    )
+    remaining = [len(partition.calls) for partition in partitions]
+    frames = [[] for _ in partitions]
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+    try:
+        while len(queue) or len(pending):
+
+            # Keep the pool busy, but never hold more than max_workers calls
+            while len(queue) and len(pending) < max_workers:
+                i, call, wrap = queue.popleft()
+                pending[pool.submit(run_call, plan, call, wrap)] = (i, call)
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, call = pending.pop(future)
+                partition = partitions[i]
+                try:
+                    dat = future.result()
+                except ValueError as e:
+
+                    # Group calls that fail are retried as chunks
+                    if not len(partition.fallback) or call not in partition.calls:
+                        raise
+                    logger.info(f"Unable to fetch a group; using chunks instead: {e}")
+                    remaining[i] += len(partition.fallback) - 1
+                    queue.extendleft((i, c, True) for c in reversed(partition.fallback))
+                    continue
+
+                frames[i].append(dat)
+                remaining[i] -= 1
+                if remaining[i] == 0:
+                    dat, frames[i] = frames[i], None
+                    dat = format_partition(plan, partition, dat)
+                    if plan.compact:
+                        dat = compact_dtypes(dat)
+                    yield i, partition, dat
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+
+def iter_plan(plan, max_workers=DEFAULT_MAX_WORKERS, by="state"):
+    """
+    Yield the formatted result of each partition of ``plan`` as soon as it
+    is done; see :func:`iter_partitions`.
+    """
+    for _, _, dat in iter_partitions(plan, max_workers=max_workers, by=by):
+        yield dat
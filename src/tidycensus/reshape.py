@@ -0,0 +1,223 @@
+"""Reshape ACS results between wide and tidy layouts."""
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .parsers import annotation_codes
+
+
+def combine_chunks(frames):
+    """
+    Combine the results for chunks of variables into one wide frame.
+
+    The chunks are indexed by GEOID and joined with a single column-wise
+    concatenation. Every chunk normally covers the same geographies in the
+    same order, so no join is needed; if the row sets differ, the chunks are
+    aligned on the union of their GEOIDs instead.
+    """
+    frames = list(frames)
+    if len(frames) == 1:
+        return frames[0]
+
+    # Keep NAME from the first chunk only
+    pieces = [frames[0].set_index("GEOID")] + [
+        frame.drop(columns="NAME").set_index("GEOID") for frame in frames[1:]
+    ]
+
+    index = pieces[0].index
+    if all(piece.index.equals(index) for piece in pieces[1:]):
+        result = pd.concat(pieces, axis=1)
+    else:
+        # Mismatched row sets: align everything on all of the GEOIDs
+        index = pd.Index(
+            pd.concat([frame["GEOID"] for frame in frames]).unique(), name="GEOID"
+        )
+        names = pd.concat([frame.set_index("GEOID")["NAME"] for frame in frames])
+        names = names[~names.index.duplicated()].reindex(index)
+        pieces = [piece.drop(columns="NAME", errors="ignore") for piece in pieces]
+        result = pd.concat([names] + [piece.reindex(index) for piece in pieces], axis=1)
+
+    return result.reset_index()
+
+
+def _paired_block(dat, stems, suffix):
+    # One column per stem, NaN where the stem has no such column
+    return dat.reindex(columns=[stem + suffix for stem in stems]).to_numpy(
+        dtype=np.float64
+    )
+
+
+def to_tidy(dat, variables, moe_factor=1, codes=None):
+    """
+    Reshape wide ACS results to one row per GEOID and variable.
+
+    Each ``xxxE``/``xxxM`` pair in ``variables`` becomes the ``estimate`` and
+    ``moe`` columns of the long frame, which is built by flattening the paired
+    arrays rather than melting and pivoting. Rows are sorted by GEOID, NAME
+    and variable. MOEs are scaled by ``moe_factor``.
+
+    If ``codes`` holds the missing value codes for ``variables`` (see
+    :func:`~tidycensus.parsers.replace_missing`), they are added as
+    ``estimate_annotation`` and ``moe_annotation`` columns.
+    """
+    stems = sorted(set(v[:-1] for v in variables))
+    suffixes = [
+        (name, suffix)
+        for name, suffix in [("estimate", "E"), ("moe", "M")]
+        if any(v.endswith(suffix) for v in variables)
+    ]
+
+    # Sort the geographies; variables are already in order within each one
+    order = (
+        dat[["GEOID", "NAME"]]
+        .reset_index(drop=True)
+        .sort_values(["GEOID", "NAME"], kind="stable")
+        .index.to_numpy()
+    )
+    dat = dat.iloc[order]
+    n, k = len(dat), len(stems)
+
+    result = {
+        "GEOID": np.repeat(dat["GEOID"].to_numpy(), k),
+        "NAME": np.repeat(dat["NAME"].to_numpy(), k),
+        "variable": np.tile(np.array(stems, dtype=object), n),
+    }
+    for name, suffix in suffixes:
+        values = _paired_block(dat, stems, suffix).ravel()
+        if name == "moe":
+            values = values * moe_factor
+        result[name] = values
+
+    if codes is not None:
+        codes = codes.iloc[order]
+        for name, suffix in suffixes:
+            result[f"{name}_annotation"] = annotation_codes(
+                _paired_block(codes, stems, suffix).ravel()
+            )
+
+    return pd.DataFrame(result)
+
+
+def get_moe_factor(moe_level):
+
+    # Scale the published 90% MOEs to the requested confidence level
+    if moe_level == 90:
+        return 1
+    elif moe_level == 95:
+        return 1.96 / 1.645
+    elif moe_level == 99:
+        return 2.56 / 1.645
+    else:
+        raise ValueError(f"`moe_level` must be one of 90, 95, or 99.")
+
+
+def format_acs(dat, var_vector, output="tidy", moe_factor=1, codes=None, renamed=None):
+    """
+    Format wide ACS results for output.
+
+    ``var_vector`` lists the estimate/MOE columns of ``dat`` and ``codes``
+    optionally holds their missing value codes. ``renamed`` maps variable
+    names (without the E/M suffix) to the names the user asked for.
+    """
+    # Re-order it
+    sub = dat[["GEOID", "NAME"] + var_vector]
+
+    # Format results
+    if output == "tidy":
+
+        result = to_tidy(sub, var_vector, moe_factor=moe_factor, codes=codes)
+
+        if renamed is not None:
+            result["variable"] = result["variable"].replace(renamed)
+
+    elif output == "wide":
+
+        # Remove duplicate columns
+        result = sub.loc[:, ~sub.columns.duplicated()]
+
+        # Add as MOE; the columns are replaced in one block, since assigning
+        # them one at a time would fragment the frame
+        moe_vars = [col for col in result if col.endswith("M")]
+        if moe_factor != 1 and len(moe_vars):
+            scaled = result[moe_vars] * moe_factor
+            result = pd.concat([result.drop(columns=moe_vars), scaled], axis=1)[
+                list(result.columns)
+            ]
+
+        # Add the missing value codes, named like the Census annotation variables
+        if codes is not None:
+            annotations = pd.DataFrame(
+                {
+                    f"{col}A": annotation_codes(codes[col].to_numpy())
+                    for col in var_vector
+                },
+                index=result.index,
+            )
+            result = pd.concat([result, annotations], axis=1)
+
+        if renamed is not None:
+            for variable, new_name in renamed.items():
+                sub = result.filter(regex=f"^{variable}", axis=1)
+                new_cols = dict(
+                    zip(
+                        sub.columns,
+                        [col.replace(variable, new_name) for col in sub.columns],
+                    )
+                )
+                result = result.rename(columns=new_cols)
+
+    else:
+        result = dat
+
+    return result
+
+
+def downcast_float(values):
+
+    # Use float32 only if every value survives the round trip
+    x = values.to_numpy(dtype=np.float64)
+    with np.errstate(over="ignore"):
+        x32 = x.astype(np.float32)
+    if np.array_equal(x32.astype(np.float64), x, equal_nan=True):
+        return pd.Series(x32, index=values.index, name=values.name)
+    return values
+
+
+def compact_dtypes(dat):
+    """
+    Shrink the memory footprint of a result without changing its values.
+
+    Text columns that repeat (NAME, variable and, in tidy output, GEOID)
+    become categoricals, and float columns become float32 when no value
+    loses precision. The memory saved is logged and stored in
+    ``attrs["compact"]``.
+    """
+    before = int(dat.memory_usage(deep=True).sum())
+
+    columns = {}
+    for col in dat.columns:
+        values = dat[col]
+        if pd.api.types.is_float_dtype(values.dtype):
+            columns[col] = downcast_float(values)
+        elif (
+            pd.api.types.is_string_dtype(values.dtype)
+            and not isinstance(values.dtype, pd.CategoricalDtype)
+            and values.nunique() <= len(values) / 2
+        ):
+            columns[col] = values.astype("category")
+        else:
+            columns[col] = values
+    result = pd.DataFrame(columns, index=dat.index)
+
+    after = int(result.memory_usage(deep=True).sum())
+    result.attrs["compact"] = {
+        "before": before,
+        "after": after,
+        "saved": before - after,
+    }
+    logger.info(
+        f"Compact dtypes: {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB "
+        f"({before / max(after, 1):.1f}x smaller)"
+    )
+
+    return result
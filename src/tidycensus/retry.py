@@ -0,0 +1,232 @@
+"""Retry failed Census API calls and pace requests to avoid throttling."""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from loguru import logger
+
+from . import parallel
+from .metrics import emit
+
+# How many times a call is tried before giving up
+DEFAULT_MAX_ATTEMPTS = 5
+
+# The exponential backoff between attempts, in seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+# The longest Retry-After delay honored, in seconds
+RETRY_AFTER_MAX = 60
+
+# The (connect, read) timeout of each attempt, in seconds
+DEFAULT_TIMEOUT = (10, 120)
+
+# Responses worth retrying, and those that mean we are sending too much
+RETRY_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+
+class RateLimiter:
+    """
+    Pace the requests sent to one host by all workers.
+
+    A token bucket allows ``rate`` requests per second on average, with
+    bursts of up to ``burst`` (``rate=None`` means no limit). On top of
+    that, the number of requests in flight is capped by an adaptive limit:
+    it is halved each time the API throttles a request and grows back by
+    about one per round of successful requests, up to ``max_concurrency``.
+    A ``Retry-After`` from the API pauses every worker.
+    """
+
+    def __init__(self, rate=None, burst=None, max_concurrency=None):
+        if max_concurrency is None:
+            max_concurrency = parallel.MAX_REQUESTS_PER_HOST
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate or 1)
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.tokens = float(self.burst)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def __repr__(self):
+        return (
+            f"RateLimiter(rate={self.rate}, burst={self.burst}, "
+            f"limit={int(self.limit)}/{self.max_concurrency})"
+        )
+
+    def _wait_time(self, now):
+
+        # Refill the bucket
+        if self.rate is not None:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self._updated) * self.rate
+            )
+        self._updated = now
+
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.limit):
+            return None  # until a request finishes
+        if self.rate is not None and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0
+
+    def _take(self):
+        if self.rate is not None:
+            self.tokens -= 1
+        self.in_flight += 1
+
+    def acquire(self):
+        """Wait until a request may be sent."""
+        with self._cond:
+            while True:
+                wait = self._wait_time(time.monotonic())
+                if wait == 0:
+                    break
+                self._cond.wait(wait)
+            self._take()
+
+    def try_acquire(self):
+        """
+        Take a request slot if one is free, without waiting. Returns 0 if it
+        was taken, else how long to wait before trying again (None if until
+        a request finishes).
+        """
+        with self._cond:
+            wait = self._wait_time(time.monotonic())
+            if wait == 0:
+                self._take()
+            return wait
+
+    def release(self, throttled=False, retry_after=None):
+        """Record that a request finished, and whether it was throttled."""
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+                logger.info(
+                    f"The API is throttling requests; lowering concurrency to {int(self.limit)}"
+                )
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            if retry_after is not None:
+                self.paused_until = max(
+                    self.paused_until, time.monotonic() + retry_after
+                )
+            self._cond.notify_all()
+
+
+_limiters = {}
+_limiter_lock = threading.Lock()
+_rate = None
+_burst = None
+
+
+def host_limiter(url):
+    """The rate limiter shared by every request to the host of ``url``."""
+    host = urlsplit(url).netloc
+    with _limiter_lock:
+        limiter = _limiters.get(host)
+        if limiter is None or limiter.max_concurrency != parallel.MAX_REQUESTS_PER_HOST:
+            limiter = _limiters[host] = RateLimiter(_rate, _burst)
+        return limiter
+
+
+def set_rate_limit(rate=None, burst=None):
+    """
+    Limit every host to ``rate`` requests per second, with bursts of up to
+    ``burst``. ``rate=None`` removes the limit.
+    """
+    global _rate, _burst
+
+    if rate is not None and rate <= 0:
+        raise ValueError("The rate limit must be positive.")
+
+    with _limiter_lock:
+        _rate, _burst = rate, burst
+        _limiters.clear()
+
+
+def retry_after_seconds(value):
+    """
+    Parse a ``Retry-After`` header (seconds or an HTTP date), capped at
+    ``RETRY_AFTER_MAX``.
+    """
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(RETRY_AFTER_MAX, max(0.0, seconds))
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given (0-based) retry."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def send_with_retries(session, url, params=None, max_attempts=None, timeout=None):
+    """
+    Send a GET request, retrying connection errors and 5xx/429 responses.
+
+    Every attempt waits for the host's :class:`RateLimiter`. Between
+    attempts, the ``Retry-After`` delay is used if the API sent one, or an
+    exponential backoff with jitter otherwise. Once the attempts run out,
+    the last response is returned (or the last connection error raised).
+    Each attempt times out after ``timeout`` (``DEFAULT_TIMEOUT`` if None).
+    Each call emits one "http" metric event, covering all of its attempts.
+    """
+    if max_attempts is None:
+        max_attempts = DEFAULT_MAX_ATTEMPTS
+    if timeout is None:
+        timeout = DEFAULT_TIMEOUT
+    limiter = host_limiter(url)
+    start = time.perf_counter()
+
+    for attempt in range(max_attempts):
+        call = error = retry_after = None
+        throttled = False
+
+        limiter.acquire()
+        try:
+            call = session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+        else:
+            if call.status_code in RETRY_STATUS:
+                throttled = call.status_code in THROTTLE_STATUS
+                retry_after = retry_after_seconds(call.headers.get("Retry-After"))
+        finally:
+            limiter.release(throttled=throttled, retry_after=retry_after)
+
+        if call is not None and call.status_code not in RETRY_STATUS:
+            break
+        if attempt == max_attempts - 1:
+            break
+
+        delay = retry_after if retry_after is not None else backoff_delay(attempt)
+        reason = error if error is not None else f"status {call.status_code}"
+        logger.info(f"Call failed ({reason}). Retrying in {delay:.1f}s...")
+        time.sleep(delay)
+
+    emit(
+        "http",
+        time.perf_counter() - start,
+        url=url,
+        status=None if call is None else call.status_code,
+        bytes=None if call is None else len(call.content),
+        retries=attempt,
+    )
+    if call is None:
+        raise error
+    return call
@@ -0,0 +1,76 @@
+"""A shared, pooled HTTP session for all Census API calls."""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import parallel
+
+# The root of the Census data API
+DEFAULT_API_URL = "https://api.census.gov/data"
+
+_session = None
+_session_pool_size = None  # only set for sessions created here
+_api_url = os.getenv("TIDYCENSUS_API_URL", DEFAULT_API_URL)
+_lock = threading.Lock()
+
+
+def create_session(pool_size=None):
+    """
+    Create a session with connection pooling and keep-alive.
+
+    The connection pool defaults to the per-host request limit, so every
+    concurrent worker can reuse an open connection.
+    """
+    if pool_size is None:
+        pool_size = parallel.MAX_REQUESTS_PER_HOST
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    return session
+
+
+def get_session():
+    """
+    Return the process-wide session, creating it on first use.
+
+    A default session is rebuilt if the per-host request limit has changed
+    since it was created; injected sessions are always used as is.
+    """
+    global _session, _session_pool_size
+
+    with _lock:
+        limit = parallel.MAX_REQUESTS_PER_HOST
+        if _session is None or (
+            _session_pool_size is not None and _session_pool_size != limit
+        ):
+            _session = create_session(limit)
+            _session_pool_size = limit
+        return _session
+
+
+def set_session(session=None, api_url=None):
+    """
+    Replace the process-wide session and/or the API root URL.
+
+    Passing ``session=None`` drops the current session so a fresh default one
+    is created on next use. ``api_url`` can point calls at a local stand-in
+    for api.census.gov (it can also be set with ``TIDYCENSUS_API_URL``).
+    """
+    global _session, _session_pool_size, _api_url
+
+    with _lock:
+        _session = session
+        _session_pool_size = None
+        if api_url is not None:
+            _api_url = api_url.rstrip("/")
+
+
+def get_api_url():
+    """The root URL of the Census data API."""
+    return _api_url
@@ -0,0 +1,295 @@
+"""Write large ACS requests straight to a partitioned Parquet dataset."""
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .acs import plan_acs
+from .parallel import DEFAULT_MAX_WORKERS
+from .plan import iter_partitions
+from .reshape import combine_chunks
+from .utils import validate_state, verify_list_inputs
+
+# Parquet support is optional
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# The name of the manifest at the root of each dataset
+MANIFEST = "_manifest.json"
+
+# Geographies whose GEOIDs start with the state FIPS code
+STATE_GEOGRAPHIES = {
+    "state",
+    "county",
+    "county subdivision",
+    "tract",
+    "block group",
+    "place",
+    "congressional district",
+    "state legislative district (upper chamber)",
+    "state legislative district (lower chamber)",
+    "school district (elementary)",
+    "school district (secondary)",
+    "school district (unified)",
+    "public use microdata area",
+}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "Writing and reading ACS datasets requires pyarrow; install it with `pip install pyarrow`."
+        )
+
+
+def plan_key(plan):
+    """
+    A fingerprint of the request behind ``plan``.
+
+    Two plans with the same fingerprint fetch the same calls and format
+    them the same way, so a dataset written for one answers the other.
+    """
+    calls = [
+        [call.base, sorted(call.params.items())]
+        for partition in plan.partitions
+        for call in (partition.fallback if len(partition.fallback) else partition.calls)
+    ]
+    normalized = {
+        "geography": plan.geography,
+        "year": plan.year,
+        "survey": plan.survey,
+        "output": plan.output,
+        "moe_factor": plan.moe_factor,
+        "renamed": plan.renamed,
+        "annotate_missing": plan.annotate_missing,
+        "compact": plan.compact,
+        "calls": calls,
+    }
+    blob = json.dumps(normalized, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def read_manifest(path):
+    """The manifest of the dataset at ``path``, or ``None`` if there isn't one."""
+    try:
+        with open(Path(path) / MANIFEST) as ff:
+            return json.load(ff)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(path, manifest):
+
+    # Write atomically; the manifest marks the dataset as complete
+    tmp = Path(path) / f"{MANIFEST}.tmp"
+    with open(tmp, "w") as ff:
+        json.dump(manifest, ff, indent=2)
+    os.replace(tmp, Path(path) / MANIFEST)
+
+
+def state_groups(geography, dat):
+
+    # Split a partition by the state each geography is in
+    if geography in STATE_GEOGRAPHIES and len(dat):
+        for state, piece in dat.groupby(dat["GEOID"].str[:2], sort=False):
+            yield state, piece
+    else:
+        yield "all", dat
+
+
+def sink_acs(
+    path,
+    geography,
+    by="state",
+    overwrite=False,
+    max_workers=DEFAULT_MAX_WORKERS,
+    verbose=False,
+    **kwargs,
+):
+    """
+    Fetch ACS data straight into a partitioned Parquet dataset.
+
+    Takes the arguments of :func:`~tidycensus.get_acs` (other than
+    ``max_workers``, ``progress`` and ``executor``). Each partition (see
+    :func:`~tidycensus.iter_acs`) is written as soon as it arrives, in a
+    hive-style ``year=/survey=/state=`` layout under ``path``, so the full
+    result is never held in memory. A ``_manifest.json`` listing every file
+    is written last.
+
+    If ``path`` already holds a complete dataset for the same request,
+    nothing is fetched. Otherwise, an existing dataset for a different
+    request is an error unless ``overwrite`` is set.
+
+    Returns the manifest; use :func:`read_acs_dataset` to load the data.
+    """
+    require_pyarrow()
+
+    # Set the logging level to warnings or higher
+    if not verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+
+    path = Path(path)
+    plan = plan_acs(geography, **kwargs)
+    key = plan_key(plan)
+
+    # Reuse a complete dataset for the same request
+    manifest = read_manifest(path)
+    if manifest is not None:
+        if manifest["request"] == key and not overwrite:
+            logger.info(f"Using the existing ACS dataset at {path}")
+            return manifest
+        if not overwrite:
+            raise ValueError(
+                f"{path} holds a dataset for a different request; pass `overwrite=True` to replace it."
+            )
+
+        # Remove the old dataset, manifest first so it is never half valid
+        os.remove(path / MANIFEST)
+        for entry in manifest["files"]:
+            try:
+                os.remove(path / entry["path"])
+            except FileNotFoundError:
+                pass
+
+    path.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for i, partition, dat in iter_partitions(plan, max_workers=max_workers, by=by):
+        for j, (state, piece) in enumerate(state_groups(plan.geography, dat)):
+            relpath = Path(
+                f"year={plan.year}",
+                f"survey={plan.survey.replace('/', '-')}",
+                f"state={state}",
+                f"part-{len(files):05d}.parquet",
+            )
+            (path / relpath).parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(
+                pa.Table.from_pandas(piece, preserve_index=False), path / relpath
+            )
+            files.append(
+                {
+                    "path": relpath.as_posix(),
+                    "partition": i,
+                    "piece": j,
+                    "source": [
+                        partition.kind,
+                        list(partition.state),
+                        list(partition.county),
+                    ],
+                    "state": state,
+                    "rows": len(piece),
+                    "columns": list(piece.columns),
+                }
+            )
+            logger.info(f"Wrote {len(piece)} rows to {relpath}")
+
+    # List the files in the order of the plan, not the order they arrived
+    files = sorted(files, key=lambda entry: (entry["partition"], entry["piece"]))
+
+    manifest = {
+        "request": key,
+        "geography": plan.geography,
+        "year": plan.year,
+        "survey": plan.survey,
+        "output": plan.output,
+        "rows": sum(entry["rows"] for entry in files),
+        "files": files,
+        "created": time.time(),
+    }
+    write_manifest(path, manifest)
+
+    return manifest
+
+
+def read_acs_dataset(path, columns=None, state=None):
+    """
+    Load a dataset written by :func:`sink_acs`.
+
+    Only the files for the requested ``state`` (FIPS codes, abbreviations or
+    names) are read, and only the requested ``columns``; GEOID and NAME are
+    always included. The result has the rows and columns ``get_acs`` would
+    return: wide results split over several files are joined on GEOID, and
+    tidy results are put back in ``get_acs``'s row order.
+    """
+    require_pyarrow()
+
+    path = Path(path)
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise ValueError(f"No complete ACS dataset found at {path}.")
+
+    # Partition pruning
+    files = manifest["files"]
+    state = verify_list_inputs(state)
+    if len(state):
+        state = set(validate_state(s) for s in state)
+        files = [entry for entry in files if entry["state"] in state]
+
+    # Column pruning
+    keep = None if columns is None else set(columns) | {"GEOID", "NAME"}
+    pieces = []
+    for entry in files:
+        cols = entry["columns"]
+        if keep is not None:
+            cols = [col for col in cols if col in keep]
+        pieces.append(pq.read_table(path / entry["path"], columns=cols).to_pandas())
+
+    if not len(pieces):
+        return pd.DataFrame(columns=["GEOID", "NAME"])
+
+    if manifest["output"] == "tidy":
+        return combine_tidy(files, pieces)
+
+    # Files with the same columns hold the same variables
+    groups = {}
+    for entry, dat in zip(files, pieces):
+        groups.setdefault(tuple(entry["columns"]), []).append(dat)
+    frames = [
+        pd.concat(group, ignore_index=True) if len(group) > 1 else group[0]
+        for group in groups.values()
+    ]
+    return combine_chunks(frames)
+
+
+def combine_tidy(files, pieces):
+    """
+    Put tidy pieces back in the order ``get_acs`` returns them.
+
+    The pieces of each partition of the plan (its states and variable
+    chunks) are interleaved by GEOID, in the order the GEOIDs first appear.
+    Partitions of the same table type are then stacked, and different table
+    types are merged with a stable sort on GEOID.
+    """
+    sources = {}
+    for entry, dat in zip(files, pieces):
+        kind, state, county = entry["source"]
+        sources.setdefault((kind, tuple(state), tuple(county)), []).append(dat)
+
+    by_kind = {}
+    for (kind, _, _), parts in sources.items():
+        dat = parts[0]
+        if len(parts) > 1:
+            dat = pd.concat(parts, ignore_index=True)
+            order = np.argsort(pd.factorize(dat["GEOID"])[0], kind="stable")
+            dat = dat.iloc[order].reset_index(drop=True)
+        by_kind.setdefault(kind, []).append(dat)
+
+    frames = [
+        pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        for parts in by_kind.values()
+    ]
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True).sort_values(
+        "GEOID", kind="stable", ignore_index=True
+    )
@@ -0,0 +1,453 @@
+"""
+A local stand-in for the Census data API, for tests and benchmarks.
+
+:class:`FakeCensusApi` serves synthetic (or recorded) responses for
+``/data/{year}/acs/{survey}[/subject|/profile]`` and the matching
+``variables.json``, with the API's ``get``/``for``/``in`` semantics and
+``group()`` queries. Latency, errors and throttling can be injected, so
+concurrency, caching and retries can be exercised offline::
+
+    with FakeCensusApi(tracts_per_county=25, latency=0.05) as api:
+        dat = get_acs("tract", table="B01001", state="PA", key="test")
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import requests
+from loguru import logger
+
+from . import session as census_session
+from .parsers import MISSING_VALUES
+from .utils import fips_index
+
+# Use a faster JSON encoder when one is installed
+try:
+    from orjson import dumps
+except ImportError:
+
+    def dumps(obj):
+        return json.dumps(obj).encode("utf-8")
+
+
+# The tables served by default, and how many variables each has
+DEFAULT_TABLES = {
+    "B01001": 49,
+    "B01003": 1,
+    "B19013": 1,
+    "B25001": 1,
+    "B25003": 3,
+    "B25077": 1,
+    "C17002": 8,
+    "S0101": 30,
+    "S1701": 20,
+    "DP02": 40,
+    "DP05": 30,
+    "K200101": 1,
+}
+
+# The parent geographies included with each geography
+ANCESTORS = {
+    "us": [],
+    "state": [],
+    "county": ["state"],
+    "tract": ["state", "county"],
+    "block group": ["state", "county", "tract"],
+    "place": ["state"],
+    "zip code tabulation area": [],
+    "metropolitan statistical area/micropolitan statistical area": [],
+}
+
+
+def table_variables(table, n):
+    """The names of the ``n`` variables of a table, formatted like the API's."""
+    if table.startswith("S"):
+        return [f"{table}_C01_{i:03d}" for i in range(1, n + 1)]
+    if table.startswith("DP"):
+        return [f"{table}_{i:04d}" for i in range(1, n + 1)]
+    return [f"{table}_{i:03d}" for i in range(1, n + 1)]
+
+
+def endpoint_tables(endpoint, tables):
+
+    # The tables published by each endpoint
+    if endpoint.endswith("/subject"):
+        return {t: n for t, n in tables.items() if t.startswith("S")}
+    if endpoint.endswith("/profile"):
+        return {t: n for t, n in tables.items() if t.startswith("DP")}
+    if endpoint.startswith("acsse"):
+        return {t: n for t, n in tables.items() if t.startswith("K")}
+    return {t: n for t, n in tables.items() if t[0] in "BC"}
+
+
+def fixture_key(path, params):
+    """The key of a recorded response; the API key is never part of it."""
+    normalized = {k: params.get(k) for k in ["get", "for", "in"]}
+    blob = json.dumps([path, normalized], sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+class FakeCensusApi:
+    """
+    A local HTTP server that behaves like api.census.gov/data.
+
+    Geographies are synthetic but use real state and county FIPS codes, so
+    they validate like real requests: every county has ``tracts_per_county``
+    tracts with ``block_groups_per_tract`` block groups each (25 and 3 give
+    national block group scale). ``tables`` maps table names to their number
+    of variables. Values are random but reproducible for a ``seed``, and
+    ``missing_rate`` of them are Census missing value codes.
+
+    Faults are injected at random: ``error_rate`` of requests fail with a
+    500 and ``throttle_rate`` with a 429 (with ``Retry-After: retry_after``
+    if given). ``latency`` (seconds, or a ``(low, high)`` range) delays each
+    response. :meth:`fail_next` queues specific failures.
+
+    With ``fixtures``, responses recorded in that directory are served as
+    is. If ``upstream`` is set too, requests without a recording are
+    forwarded there and recorded.
+    """
+
+    def __init__(
+        self,
+        tables=None,
+        tracts_per_county=4,
+        block_groups_per_tract=3,
+        places_per_state=5,
+        n_zctas=500,
+        n_cbsas=50,
+        seed=0,
+        missing_rate=0.01,
+        latency=0,
+        error_rate=0,
+        throttle_rate=0,
+        retry_after=None,
+        invalid_keys=(),
+        fixtures=None,
+        upstream=None,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.tables = dict(DEFAULT_TABLES if tables is None else tables)
+        self.tracts_per_county = tracts_per_county
+        self.block_groups_per_tract = block_groups_per_tract
+        self.places_per_state = places_per_state
+        self.n_zctas = n_zctas
+        self.n_cbsas = n_cbsas
+        self.seed = seed
+        self.missing_rate = missing_rate
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.invalid_keys = set(invalid_keys)
+        self.fixtures = Path(fixtures) if fixtures is not None else None
+        self.upstream = upstream
+
+        self.requests = []  # (path, params) of every data request
+        self._failures = []
+        self._geographies = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._previous_url = None
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, headers, body = api.respond(self.path)
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client timed out or went away; nobody is listening
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def __repr__(self):
+        return f"FakeCensusApi(url='{self.url}')"
+
+    @property
+    def url(self):
+        """The root URL, to use in place of https://api.census.gov/data."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/data"
+
+    def start(self):
+        """Serve requests from a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._server.serve_forever, daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        """Start serving and point tidycensus at this server."""
+        self.start()
+        self._previous_url = census_session.get_api_url()
+        census_session.set_session(None, api_url=self.url)
+        return self
+
+    def __exit__(self, *exc):
+        census_session.set_session(None, api_url=self._previous_url)
+        self.stop()
+
+    def fail_next(self, n=1, status=500, retry_after=None):
+        """Fail the next ``n`` data requests with ``status``."""
+        with self._lock:
+            self._failures.extend([(status, retry_after)] * n)
+
+    # Responses
+
+    def respond(self, path):
+        """Return the status, headers and body for a request to ``path``."""
+        url = urlsplit(path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        parts = url.path.strip("/").split("/")
+        if len(parts) < 4 or parts[0] != "data" or parts[2] != "acs":
+            return 404, {}, b"Not found"
+        year, endpoint = parts[1], "/".join(parts[3:])
+
+        if endpoint.endswith("/variables.json"):
+            return 200, {}, self.variables_json(endpoint[: -len("/variables.json")])
+
+        with self._lock:
+            self.requests.append((url.path, params))
+            failure = self._failures.pop(0) if len(self._failures) else None
+            draw = self._random.random()
+            latency = self.latency
+            if isinstance(latency, (tuple, list)):
+                latency = self._random.uniform(*latency)
+
+        if latency:
+            time.sleep(latency)
+
+        # Injected faults
+        if failure is None and draw < self.throttle_rate:
+            failure = (429, self.retry_after)
+        elif failure is None and draw < self.throttle_rate + self.error_rate:
+            failure = (500, None)
+        if failure is not None:
+            status, retry_after = failure
+            headers = {} if retry_after is None else {"Retry-After": str(retry_after)}
+            return status, headers, b"Service unavailable"
+
+        if params.get("key") in self.invalid_keys:
+            return (
+                200,
+                {},
+                b"You included a key with this request, however, it is not valid.",
+            )
+
+        # Recorded responses
+        if self.fixtures is not None:
+            fixture = self.fixtures / f"{fixture_key(url.path, params)}.json"
+            if fixture.exists():
+                return 200, {}, fixture.read_bytes()
+            if self.upstream is not None:
+                return self.record(url.path, params, fixture)
+
+        try:
+            return 200, {}, self.data_json(endpoint, params)
+        except ValueError as e:
+            return 400, {}, f"error: {e}".encode("utf-8")
+
+    def record(self, path, params, fixture):
+
+        # Forward to the real API and save the response
+        upstream = self.upstream.rstrip("/") + path[len("/data") :]
+        call = requests.get(upstream, params=params)
+        if call.status_code == 200:
+            fixture.parent.mkdir(parents=True, exist_ok=True)
+            fixture.write_bytes(call.content)
+            logger.info(f"Recorded {upstream} to {fixture.name}")
+        return call.status_code, {}, call.content
+
+    def variables_json(self, endpoint):
+        """The ``variables.json`` of an endpoint."""
+        variables = {
+            "NAME": {"label": "Geographic Area Name", "group": "N/A"},
+            "GEO_ID": {"label": "Geography", "group": "N/A"},
+        }
+        for table, n in endpoint_tables(endpoint, self.tables).items():
+            for i, name in enumerate(table_variables(table, n)):
+                label = "Total:" if i == 0 else f"Total:!!Category {i}"
+                meta = {"concept": f"TABLE {table}", "group": table}
+                variables[f"{name}E"] = {"label": f"Estimate!!{label}", **meta}
+                variables[f"{name}M"] = {"label": f"Margin of Error!!{label}", **meta}
+                variables[f"{name}EA"] = {
+                    "label": f"Annotation of Estimate!!{label}",
+                    **meta,
+                }
+                variables[f"{name}MA"] = {
+                    "label": f"Annotation of Margin of Error!!{label}",
+                    **meta,
+                }
+        return dumps({"variables": variables})
+
+    def geographies(self, geography):
+        """The columns (codes and NAME) of every area of a geography."""
+        with self._lock:
+            if geography not in self._geographies:
+                self._geographies[geography] = self._build_geographies(geography)
+            return self._geographies[geography]
+
+    def _build_geographies(self, geography):
+        index = fips_index()
+        states = sorted(index.counties)
+        state_names = index.county_states
+
+        if geography == "us":
+            return {"us": np.array(["1"]), "NAME": np.array(["United States"])}
+        if geography == "state":
+            return {
+                "state": np.array(states),
+                "NAME": np.array([state_names[s] for s in states]),
+            }
+        if geography == "place":
+            rows = [
+                (s, f"{10 * (i + 1):05d}", f"Place {i + 1} city, {state_names[s]}")
+                for s in states
+                for i in range(self.places_per_state)
+            ]
+            return dict(zip(["state", "place", "NAME"], map(np.array, zip(*rows))))
+        if geography == "zip code tabulation area":
+            codes = [f"{10000 + 7 * i:05d}" for i in range(self.n_zctas)]
+            return {
+                "zip code tabulation area": np.array(codes),
+                "NAME": np.array([f"ZCTA5 {code}" for code in codes]),
+            }
+        if geography == "metropolitan statistical area/micropolitan statistical area":
+            codes = [f"{10000 + 20 * i:05d}" for i in range(self.n_cbsas)]
+            return {
+                geography: np.array(codes),
+                "NAME": np.array([f"Metro Area {code}" for code in codes]),
+            }
+
+        rows = []
+        for s in states:
+            for c, county in sorted(index.counties[s].items()):
+                name = f"{county}, {state_names[s]}"
+                if geography == "county":
+                    rows.append((s, c, name))
+                    continue
+                for t in range(1, self.tracts_per_county + 1):
+                    tract = f"{100 * t:06d}"
+                    tract_name = f"Census Tract {t}, {name}"
+                    if geography == "tract":
+                        rows.append((s, c, tract, tract_name))
+                        continue
+                    for b in range(1, self.block_groups_per_tract + 1):
+                        rows.append(
+                            (s, c, tract, str(b), f"Block Group {b}, {tract_name}")
+                        )
+
+        if geography not in ANCESTORS:
+            raise ValueError("unknown/unsupported geography heirarchy")
+        columns = ANCESTORS[geography] + [geography, "NAME"]
+        return dict(zip(columns, map(np.array, zip(*rows))))
+
+    def values(self, variable, n):
+        """Reproducible random values for a variable, as the API's strings."""
+        rng = np.random.default_rng([self.seed, zlib.crc32(variable.encode("utf-8"))])
+        high = 1000 if variable.endswith("M") else 10000
+        values = rng.integers(0, high, n)
+        if self.missing_rate:
+            missing = rng.random(n) < self.missing_rate
+            values[missing] = rng.choice(MISSING_VALUES, missing.sum())
+        return values.astype(str)
+
+    def data_json(self, endpoint, params):
+        """The response to a data request, as the API's list of lists."""
+        tables = endpoint_tables(endpoint, self.tables)
+        known = {
+            name: table
+            for table, n in tables.items()
+            for name in table_variables(table, n)
+        }
+
+        # Requested variables, expanding group() queries
+        get = []
+        for name in params.get("get", "").split(","):
+            if name.startswith("group(") and name.endswith(")"):
+                table = name[len("group(") : -1]
+                if table not in tables:
+                    raise ValueError(f"unknown variable '{name}'")
+                for stem in table_variables(table, tables[table]):
+                    get += [f"{stem}E", f"{stem}EA", f"{stem}M", f"{stem}MA"]
+                get += ["GEO_ID", "NAME"]
+            elif name in ["NAME", "GEO_ID"] or name[:-1] in known or name[:-2] in known:
+                if name not in get:
+                    get.append(name)
+            else:
+                raise ValueError(f"unknown variable '{name}'")
+
+        # Parse the for/in clauses
+        if "for" not in params:
+            raise ValueError("the 'for' clause is required")
+        geography, for_codes = params["for"].split(":", 1)
+        if geography not in ANCESTORS:
+            raise ValueError("unknown/unsupported geography heirarchy")
+        filters = {geography: for_codes}
+        in_clause = params.get("in", "").replace("&in=", " ").replace("+", " ")
+        for part in in_clause.split():
+            name, codes = part.split(":", 1)
+            filters[name] = codes
+
+        geos = self.geographies(geography)
+        mask = np.ones(len(geos["NAME"]), dtype=bool)
+        for name, codes in filters.items():
+            if codes == "*":
+                continue
+            if name not in geos:
+                raise ValueError("unknown/unsupported geography heirarchy")
+            mask &= np.isin(geos[name], codes.split(","))
+        rows = {name: values[mask] for name, values in geos.items()}
+        n = int(mask.sum())
+
+        # Build the columns
+        geo_columns = ANCESTORS[geography] + [geography]
+        columns = []
+        for name in get:
+            if name == "NAME":
+                columns.append(rows["NAME"])
+            elif name == "GEO_ID":
+                geoid = np.full(n, "", dtype=object)
+                for col in geo_columns:
+                    geoid = geoid + rows[col].astype(object)
+                columns.append(np.array(["1400000US" + g for g in geoid]))
+            elif name.endswith("A"):
+                columns.append(np.full(n, None, dtype=object))
+            else:
+                columns.append(self.values(name, n))
+        columns += [rows[col] for col in geo_columns]
+
+        body = [get + geo_columns]
+        body.extend(list(row) for row in zip(*[col.tolist() for col in columns]))
+        return dumps(body)
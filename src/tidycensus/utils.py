@@ -1,6 +1,9 @@
+import csv
+import threading
+from bisect import bisect_left
+from collections import namedtuple
 from re import match
 
-import pandas as pd
 from loguru import logger
 
 from . import DATA_DIR
@@ -14,6 +17,111 @@ def verify_list_inputs(param):
     return param
 
 
+# The FIPS lookup tables, built once per process on first use
+FipsIndex = namedtuple(
+    "FipsIndex",
+    [
+        "state_by_fips",
+        "state_by_abb",
+        "state_by_name",
+        "counties",
+        "county_states",
+        "county_prefixes",
+    ],
+)
+
+# A county matched by name
+CountyMatch = namedtuple("CountyMatch", ["state", "county", "name"])
+
+_fips_index = None
+_fips_lock = threading.Lock()
+
+
+def _build_fips_index():
+
+    # States, keyed by FIPS code, abbreviation and lowercase name
+    state_by_fips, state_by_abb, state_by_name = {}, {}, {}
+    with open(DATA_DIR / "fips_state_table.csv", newline="") as ff:
+        for row in csv.DictReader(ff):
+            state_by_fips[row["fips"]] = row["name"]
+            state_by_abb[row["abb"]] = row["fips"]
+            state_by_name[row["name"]] = row["fips"]
+
+    # Counties, keyed by state FIPS and then county FIPS
+    counties, county_states = {}, {}
+    with open(DATA_DIR / "fips_codes.csv", newline="") as ff:
+        for row in csv.DictReader(ff):
+            counties.setdefault(row["state_code"], {})[row["county_code"]] = row[
+                "county"
+            ]
+            county_states[row["state_code"]] = row["state_name"]
+
+    # Case-folded, sorted county names per state (and across all states,
+    # under None) for prefix searches
+    county_prefixes = {}
+    for state, table in counties.items():
+        for code, name in table.items():
+            entry = (name.casefold(), CountyMatch(state, code, name))
+            county_prefixes.setdefault(state, []).append(entry)
+            county_prefixes.setdefault(None, []).append(entry)
+    for state, entries in county_prefixes.items():
+        entries.sort()
+        county_prefixes[state] = (
+            [key for key, _ in entries],
+            [match for _, match in entries],
+        )
+
+    return FipsIndex(
+        state_by_fips,
+        state_by_abb,
+        state_by_name,
+        counties,
+        county_states,
+        county_prefixes,
+    )
+
+
+def fips_index():
+    """Return the FIPS lookup tables, building them on first use."""
+    global _fips_index
+
+    if _fips_index is None:
+        with _fips_lock:
+            if _fips_index is None:
+                _fips_index = _build_fips_index()
+    return _fips_index
+
+
+def _match_county_prefix(index, state, county):
+
+    # All names in the state starting with the (case-folded) county string
+    keys, matches = index.county_prefixes.get(state, ([], []))
+    prefix = county.strip().casefold()
+    start = bisect_left(keys, prefix)
+    stop = start
+    while stop < len(keys) and keys[stop].startswith(prefix):
+        stop += 1
+    return matches[start:stop]
+
+
+def resolve_counties(counties, state=None):
+    """
+    Resolve many county names at once.
+
+    Each name is matched case-insensitively as a prefix of the county names in
+    ``state`` (any FIPS code, abbreviation or name), or of all counties if
+    ``state`` is None. Returns a dict mapping each input to the list of
+    :class:`CountyMatch` results; ambiguous names get all of their matches and
+    unknown names an empty list.
+    """
+    index = fips_index()
+    if state is not None:
+        state = validate_state(state)
+
+    counties = verify_list_inputs(counties)
+    return {county: _match_county_prefix(index, state, county) for county in counties}
+
+
 # Called to check to see if "state" is a FIPS code, full name or abbreviation.
 #
 # returns NULL if input is NULL
@@ -21,8 +129,8 @@ def verify_list_inputs(param):
 # returns error if input is not a valid FIPS code
 def validate_state(state):
 
-    # Load FIPS state table
-    FIPS_STATE_TABLE = pd.read_csv(DATA_DIR / "fips_state_table.csv", dtype=str)
+    # Load FIPS state lookups
+    index = fips_index()
 
     state = state.strip().lower()  # forgive white space
 
@@ -30,14 +138,14 @@ def validate_state(state):
 
         state = f"{int(state):02d}"  # forgive 1-digit FIPS codes
 
-        if state in FIPS_STATE_TABLE["fips"].values:
+        if state in index.state_by_fips:
             return state
         else:
             # perhaps they passed in a county FIPS by accident so forgive that, too,
             # but warn the caller
             state_sub = state[:2]
-            if state_sub in FIPS_STATE_TABLE["fips"].values:
-                name = FIPS_STATE_TABLE.query("fips == @state_sub")["name"].squeeze()
+            if state_sub in index.state_by_fips:
+                name = index.state_by_fips[state_sub]
                 logger.warning(
                     f"Using first two digits of {state} - '{state_sub}' ({name}) - for FIPS code."
                 )
@@ -49,18 +157,14 @@ def validate_state(state):
 
     elif match("^\w+", state):  # we might have state abbrev or name
 
-        if (
-            len(state) == 2 and state in FIPS_STATE_TABLE["abb"].values
-        ):  # yay, an abbrev!
-            fips = FIPS_STATE_TABLE.query("abb == @state")["fips"].squeeze()
+        if len(state) == 2 and state in index.state_by_abb:  # yay, an abbrev!
+            fips = index.state_by_abb[state]
             logger.info(f"Using FIPS code '{fips}' for state '{state.upper()}'")
             return fips
 
-        elif (
-            len(state) > 2 and state in FIPS_STATE_TABLE["name"].values
-        ):  # yay, a name!
+        elif len(state) > 2 and state in index.state_by_name:  # yay, a name!
 
-            fips = FIPS_STATE_TABLE.query("name == @state")["fips"].squeeze()
+            fips = index.state_by_name[state]
             logger.info(f"Using FIPS code '{fips}' for state '{state.capitalize()}'")
             return fips
         else:
@@ -82,11 +186,10 @@ def validate_county(state, county):
     # Get the state of the county
     state = validate_state(state)
 
-    # Load FIPS codes
-    FIPS_CODES = pd.read_csv(DATA_DIR / "fips_codes.csv", dtype=str)
-
-    # Get a df for the requested state to work with
-    COUNTY_TABLE = FIPS_CODES.query("state_code == @state")
+    # Get the counties for the requested state to work with
+    index = fips_index()
+    county_table = index.counties.get(state, {})
+    state_name = index.county_states.get(state, index.state_by_fips[state])
 
     if match("^\d+$", county):  # probably a FIPS code
 
@@ -94,36 +197,31 @@ def validate_county(state, county):
             f"{int(county):03d}"  # in case they passed in 1 or 2 digit county codes
         )
 
-        if county in COUNTY_TABLE["county_code"].values:
+        if county in county_table:
             return county
         else:
-            state = COUNTY_TABLE.iloc[0]["state_name"]
             logger.warning(
-                f"'{county}' is not a current FIPS code for counties in {state}"
+                f"'{county}' is not a current FIPS code for counties in {state_name}"
             )
         return county
 
     elif match("^\w+", county):  # should be a county name
 
-        county_index = COUNTY_TABLE["county"].str.match(f"^{county}", case=False)
-        matching_counties = COUNTY_TABLE.loc[county_index][
-            "county"
-        ]  # Get the counties that match
+        # Get the counties that match
+        matching_counties = _match_county_prefix(index, state, county)
 
         if len(matching_counties) == 0:
-            state = COUNTY_TABLE.iloc[0]["state_name"]
-            raise ValueError(f"'{county}' is not a valid name for counties in {state}")
+            raise ValueError(
+                f"'{county}' is not a valid name for counties in {state_name}"
+            )
 
         elif len(matching_counties) == 1:
 
-            matched_county = matching_counties.iloc[0]
-            fips = COUNTY_TABLE.query(f"county == '{matched_county}'")[
-                "county_code"
-            ].squeeze()
+            _, fips, matched_county = matching_counties[0]
             logger.info(f"Using FIPS code '{fips}' for '{matched_county}'")
             return fips
 
         elif len(matching_counties) > 1:
             raise ValueError(
-                f"Your county string matches: {matching_counties.tolist()}. Please refine your selection."
+                f"Your county string matches: {[m.name for m in matching_counties]}. Please refine your selection."
             )
@@ -0,0 +1,606 @@
+"""Metadata for ACS variables, stored locally once per year and survey."""
+import json
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from .cache import DEFAULT_CACHE_DIR
+from .retry import send_with_retries
+from .session import DEFAULT_API_URL, get_api_url, get_session
+
+# Variables published without a margin of error
+# find code in 'data-raw/no_moe_vars.R' to pull these vars from api
+NO_MOE_VARIABLES = frozenset(
+    [
+        "B00001_001",
+        "B00002_001",
+        "B98001_001",
+        "B98001_002",
+        "B98002_001",
+        "B98002_002",
+        "B98002_003",
+        "B98011_001",
+        "B98012_001",
+        "B98012_002",
+        "B98012_003",
+        "B98013_001",
+        "B98013_002",
+        "B98013_003",
+        "B98013_004",
+        "B98013_005",
+        "B98013_006",
+        "B98013_007",
+        "B98014_001",
+        "B98021_001",
+        "B98021_002",
+        "B98021_003",
+        "B98021_004",
+        "B98021_005",
+        "B98021_006",
+        "B98021_007",
+        "B98021_008",
+        "B98021_009",
+        "B98021_010",
+        "B98022_001",
+        "B98022_002",
+        "B98022_003",
+        "B98022_004",
+        "B98022_005",
+        "B98022_006",
+        "B98022_007",
+        "B98022_008",
+        "B98022_009",
+        "B98022_010",
+        "B98031_001",
+        "B98032_001",
+        "B99011_001",
+        "B99011_002",
+        "B99011_003",
+        "B99012_001",
+        "B99012_002",
+        "B99012_003",
+        "B99021_001",
+        "B99021_002",
+        "B99021_003",
+        "B99031_001",
+        "B99031_002",
+        "B99031_003",
+        "B99051_001",
+        "B99051_002",
+        "B99051_003",
+        "B99051_004",
+        "B99051_005",
+        "B99051_006",
+        "B99051_007",
+        "B99052_001",
+        "B99052_002",
+        "B99052_003",
+        "B99052_004",
+        "B99052_005",
+        "B99052_006",
+        "B99052_007",
+        "B99052PR_001",
+        "B99052PR_002",
+        "B99052PR_003",
+        "B99052PR_004",
+        "B99052PR_005",
+        "B99052PR_006",
+        "B99052PR_007",
+        "B99053_001",
+        "B99053_002",
+        "B99053_003",
+        "B99061_001",
+        "B99061_002",
+        "B99061_003",
+        "B99071_001",
+        "B99071_002",
+        "B99071_003",
+        "B99072_001",
+        "B99072_002",
+        "B99072_003",
+        "B99072_004",
+        "B99072_005",
+        "B99072_006",
+        "B99072_007",
+        "B99080_001",
+        "B99080_002",
+        "B99080_003",
+        "B99081_001",
+        "B99081_002",
+        "B99081_003",
+        "B99081_004",
+        "B99081_005",
+        "B99082_001",
+        "B99082_002",
+        "B99082_003",
+        "B99082_004",
+        "B99082_005",
+        "B99083_001",
+        "B99083_002",
+        "B99083_003",
+        "B99083_004",
+        "B99083_005",
+        "B99084_001",
+        "B99084_002",
+        "B99084_003",
+        "B99084_004",
+        "B99084_005",
+        "B99085_001",
+        "B99085_002",
+        "B99085_003",
+        "B99086_001",
+        "B99086_002",
+        "B99086_003",
+        "B99087_001",
+        "B99087_002",
+        "B99087_003",
+        "B99087_004",
+        "B99087_005",
+        "B99088_001",
+        "B99088_002",
+        "B99088_003",
+        "B99088_004",
+        "B99088_005",
+        "B99089_001",
+        "B99089_002",
+        "B99089_003",
+        "B99092_001",
+        "B99092_002",
+        "B99092_003",
+        "B99102_001",
+        "B99102_002",
+        "B99102_003",
+        "B99103_001",
+        "B99103_002",
+        "B99103_003",
+        "B99104_001",
+        "B99104_002",
+        "B99104_003",
+        "B99104_004",
+        "B99104_005",
+        "B99104_006",
+        "B99104_007",
+        "B99121_001",
+        "B99121_002",
+        "B99121_003",
+        "B99122_001",
+        "B99122_002",
+        "B99122_003",
+        "B99123_001",
+        "B99123_002",
+        "B99123_003",
+        "B99124_001",
+        "B99124_002",
+        "B99124_003",
+        "B99125_001",
+        "B99125_002",
+        "B99125_003",
+        "B99126_001",
+        "B99126_002",
+        "B99126_003",
+        "B99131_001",
+        "B99131_002",
+        "B99131_003",
+        "B99132_001",
+        "B99132_002",
+        "B99132_003",
+        "B99141_001",
+        "B99141_002",
+        "B99141_003",
+        "B99142_001",
+        "B99142_002",
+        "B99142_003",
+        "B99151_001",
+        "B99151_002",
+        "B99151_003",
+        "B99152_001",
+        "B99152_002",
+        "B99152_003",
+        "B99161_001",
+        "B99161_002",
+        "B99161_003",
+        "B99162_001",
+        "B99162_002",
+        "B99162_003",
+        "B99162_004",
+        "B99162_005",
+        "B99162_006",
+        "B99162_007",
+        "B99163_001",
+        "B99163_002",
+        "B99163_003",
+        "B99163_004",
+        "B99163_005",
+        "B99171_001",
+        "B99171_002",
+        "B99171_003",
+        "B99171_004",
+        "B99171_005",
+        "B99171_006",
+        "B99171_007",
+        "B99171_008",
+        "B99171_009",
+        "B99171_010",
+        "B99171_011",
+        "B99171_012",
+        "B99171_013",
+        "B99171_014",
+        "B99171_015",
+        "B99172_001",
+        "B99172_002",
+        "B99172_003",
+        "B99172_004",
+        "B99172_005",
+        "B99172_006",
+        "B99172_007",
+        "B99172_008",
+        "B99172_009",
+        "B99172_010",
+        "B99172_011",
+        "B99172_012",
+        "B99172_013",
+        "B99172_014",
+        "B99172_015",
+        "B99181_001",
+        "B99181_002",
+        "B99181_003",
+        "B99182_001",
+        "B99182_002",
+        "B99182_003",
+        "B99183_001",
+        "B99183_002",
+        "B99183_003",
+        "B99184_001",
+        "B99184_002",
+        "B99184_003",
+        "B99185_001",
+        "B99185_002",
+        "B99185_003",
+        "B99186_001",
+        "B99186_002",
+        "B99186_003",
+        "B99187_001",
+        "B99187_002",
+        "B99187_003",
+        "B99187_004",
+        "B99187_005",
+        "B99187_006",
+        "B99187_007",
+        "B99191_001",
+        "B99191_002",
+        "B99191_003",
+        "B99191_004",
+        "B99191_005",
+        "B99191_006",
+        "B99191_007",
+        "B99191_008",
+        "B99192_001",
+        "B99192_002",
+        "B99192_003",
+        "B99192_004",
+        "B99192_005",
+        "B99192_006",
+        "B99192_007",
+        "B99192_008",
+        "B99193_001",
+        "B99193_002",
+        "B99193_003",
+        "B99193_004",
+        "B99193_005",
+        "B99193_006",
+        "B99193_007",
+        "B99193_008",
+        "B99194_001",
+        "B99194_002",
+        "B99194_003",
+        "B99194_004",
+        "B99194_005",
+        "B99194_006",
+        "B99194_007",
+        "B99194_008",
+        "B99201_001",
+        "B99201_002",
+        "B99201_003",
+        "B99201_004",
+        "B99201_005",
+        "B99201_006",
+        "B99201_007",
+        "B99201_008",
+        "B99211_001",
+        "B99211_002",
+        "B99211_003",
+        "B99212_001",
+        "B99212_002",
+        "B99212_003",
+        "B99221_001",
+        "B99221_002",
+        "B99221_003",
+        "B99231_001",
+        "B99231_002",
+        "B99231_003",
+        "B99232_001",
+        "B99232_002",
+        "B99232_003",
+        "B99233_001",
+        "B99233_002",
+        "B99233_003",
+        "B99233_004",
+        "B99233_005",
+        "B99234_001",
+        "B99234_002",
+        "B99234_003",
+        "B99234_004",
+        "B99234_005",
+        "B99241_001",
+        "B99241_002",
+        "B99241_003",
+        "B99242_001",
+        "B99242_002",
+        "B99242_003",
+        "B99243_001",
+        "B99243_002",
+        "B99243_003",
+        "B99244_001",
+        "B99244_002",
+        "B99244_003",
+        "B99245_001",
+        "B99245_002",
+        "B99245_003",
+        "B99246_001",
+        "B99246_002",
+        "B99246_003",
+        "B992510_001",
+        "B992510_002",
+        "B992510_003",
+        "B992511_001",
+        "B992511_002",
+        "B992511_003",
+        "B992512_001",
+        "B992512_002",
+        "B992512_003",
+        "B992513_001",
+        "B992513_002",
+        "B992513_003",
+        "B992514_001",
+        "B992514_002",
+        "B992514_003",
+        "B992515_001",
+        "B992515_002",
+        "B992515_003",
+        "B992516_001",
+        "B992516_002",
+        "B992516_003",
+        "B992518_001",
+        "B992518_002",
+        "B992518_003",
+        "B992519_001",
+        "B992519_002",
+        "B992519_003",
+        "B99252_001",
+        "B99252_002",
+        "B99252_003",
+        "B992520_001",
+        "B992520_002",
+        "B992520_003",
+        "B992521_001",
+        "B992521_002",
+        "B992521_003",
+        "B992522_001",
+        "B992522_002",
+        "B992522_003",
+        "B992522_004",
+        "B992522_005",
+        "B992522_006",
+        "B992522_007",
+        "B992523_001",
+        "B992523_002",
+        "B992523_003",
+        "B99253_001",
+        "B99253_002",
+        "B99253_003",
+        "B99254_001",
+        "B99254_002",
+        "B99254_003",
+        "B99255_001",
+        "B99255_002",
+        "B99255_003",
+        "B99256_001",
+        "B99256_002",
+        "B99256_003",
+        "B99257_001",
+        "B99257_002",
+        "B99257_003",
+        "B99258_001",
+        "B99258_002",
+        "B99258_003",
+        "B99259_001",
+        "B99259_002",
+        "B99259_003",
+        "B992701_001",
+        "B992701_002",
+        "B992701_003",
+        "B992702_001",
+        "B992702_002",
+        "B992702_003",
+        "B992703_001",
+        "B992703_002",
+        "B992703_003",
+        "B992704_001",
+        "B992704_002",
+        "B992704_003",
+        "B992705_001",
+        "B992705_002",
+        "B992705_003",
+        "B992706_001",
+        "B992706_002",
+        "B992706_003",
+        "B992707_001",
+        "B992707_002",
+        "B992707_003",
+        "B992708_001",
+        "B992708_002",
+        "B992708_003",
+        "B992709_001",
+        "B992709_002",
+        "B992709_003",
+        "B99281_001",
+        "B99281_002",
+        "B99281_003",
+        "B99282_001",
+        "B99282_002",
+        "B99282_003",
+        "B99282_004",
+        "B99282_005",
+        "B99282_006",
+        "B99282_007",
+        "B99282_008",
+        "B99282_009",
+        "B99283_001",
+        "B99283_002",
+        "B99283_003",
+        "B99283_004",
+        "B99283_005",
+    ]
+)
+
+# A single variable, named without its E/M suffix
+Variable = namedtuple("Variable", ["name", "label", "concept", "table", "has_moe"])
+
+# The catalog for one year/survey: variables by name and variable names by table
+VariableCatalog = namedtuple("VariableCatalog", ["variables", "tables"])
+
+_catalogs = {}
+
+# One lock per catalog, so different years and surveys load in parallel
+_catalog_locks = {}
+_catalog_locks_lock = threading.Lock()
+
+
+def _catalog_lock(key):
+    with _catalog_locks_lock:
+        return _catalog_locks.setdefault(key, threading.Lock())
+
+
+def build_catalog(variables):
+    """
+    Build a catalog from the ``variables`` of an API ``variables.json``.
+
+    Only estimates are kept; each is named without its trailing "E" and
+    records whether the matching MOE ("M") variable exists.
+    """
+    records = []
+    for name, meta in variables.items():
+        table = meta.get("group")
+        if not name.endswith("E") or table in (None, "N/A"):
+            continue
+        stem = name[:-1]
+        label = meta.get("label", "")
+        if label.startswith("Estimate!!"):
+            label = label[len("Estimate!!") :]
+        records.append(
+            Variable(
+                stem, label, meta.get("concept", ""), table, f"{stem}M" in variables
+            )
+        )
+    return _index(records)
+
+
+def _index(records):
+    variables = {}
+    tables = {}
+    for record in sorted(records):
+        variables[record.name] = record
+        tables.setdefault(record.table, []).append(record.name)
+    return VariableCatalog(variables, tables)
+
+
+def _catalog_path(year, survey, cache_dir):
+    cache_dir = DEFAULT_CACHE_DIR if cache_dir is None else cache_dir
+    name = f"{year}-{survey.replace('/', '-')}.json"
+
+    # Keep catalogs from other API roots (e.g. a local stand-in) apart
+    api_url = get_api_url()
+    if api_url != DEFAULT_API_URL:
+        host = urlsplit(api_url).netloc.replace(":", "-")
+        return os.path.join(cache_dir, "variables", host, name)
+    return os.path.join(cache_dir, "variables", name)
+
+
+def _download_catalog(year, survey, session):
+    url = f"{get_api_url()}/{year}/acs/{survey}/variables.json"
+    logger.info(f"Downloading the variable list from {url}")
+
+    if session is None:
+        session = get_session()
+    call = send_with_retries(session, url)
+
+    if call.status_code != 200:
+        raise ValueError(
+            f"Unable to load the variables for the {year} {survey} ACS. "
+            f"The API message returned is {call.text}."
+        )
+    return build_catalog(call.json()["variables"])
+
+
+def load_variables_acs(year, survey, cache_dir=None, refresh=False, session=None):
+    """
+    Return the :class:`VariableCatalog` for an ACS year and survey.
+
+    The variable list is downloaded once and saved in a compact JSON file
+    under ``cache_dir``; later calls read it from disk, and repeated calls in
+    the same process are served from memory.
+    """
+    key = (year, survey, cache_dir, get_api_url())
+    if not refresh and key in _catalogs:
+        return _catalogs[key]
+
+    with _catalog_lock(key):
+        if not refresh and key in _catalogs:
+            return _catalogs[key]
+
+        path = _catalog_path(year, survey, cache_dir)
+        if not refresh and os.path.exists(path):
+            with open(path) as ff:
+                catalog = _index(Variable(*record) for record in json.load(ff))
+        else:
+            catalog = _download_catalog(year, survey, session)
+
+            # Save it for next time
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as ff:
+                json.dump(list(catalog.variables.values()), ff, separators=(",", ":"))
+            os.replace(tmp, path)
+
+        _catalogs[key] = catalog
+        return catalog
+
+
+def variables_from_table_acs(table, year, survey, cache_dir=None, session=None):
+    """The names of all of the variables in an ACS table."""
+    catalog = load_variables_acs(year, survey, cache_dir=cache_dir, session=session)
+    if table not in catalog.tables:
+        raise ValueError(f"'{table}' is not a valid table for the {year} {survey} ACS.")
+    return list(catalog.tables[table])
+
+
+def variable_labels(variables, year, survey, cache_dir=None, session=None):
+    """Map each of ``variables`` (with or without the E/M suffix) to its label."""
+    catalog = load_variables_acs(year, survey, cache_dir=cache_dir, session=session)
+    labels = {}
+    for variable in variables:
+        stem = variable[:-1] if variable[-1] in ["E", "M"] else variable
+        if stem in catalog.variables:
+            labels[variable] = catalog.variables[stem].label
+    return labels
+
+
+def variable_has_moe(variable, catalog=None):
+    """Whether ``variable`` (named without its E/M suffix) has a margin of error."""
+    if catalog is not None and variable in catalog.variables:
+        return catalog.variables[variable].has_moe
+    return variable not in NO_MOE_VARIABLES
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from tidycensus import retry, variables
+from tidycensus.acs import plan_acs
+from tidycensus.cache import request_key
+from tidycensus.testing import FakeCensusApi
+
+
+class DictCache(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+@pytest.fixture
+def fake_responses():
+    """
+    Return a function that plans a request and caches a two-county response
+    for each of its calls, so it can be run without sending anything.
+    """
+
+    def fill(geography, cache=None, **kwargs):
+        if cache is None:
+            cache = DictCache()
+        plan = plan_acs(geography, key="abc", **kwargs)
+        for partition in plan.partitions:
+            for call in partition.calls + partition.fallback:
+                columns = call.variables.split(",")
+                cache.set(
+                    request_key(call.base, call.params),
+                    pd.DataFrame(
+                        {
+                            "GEOID": ["42001", "42003"],
+                            "NAME": ["Adams", "Allegheny"],
+                            **{col: [1.0, 2.0] for col in columns},
+                        }
+                    ),
+                )
+        return cache
+
+    return fill
+
+
+@pytest.fixture
+def catalog_dir(tmp_path, monkeypatch):
+    """Keep the variable catalogs downloaded by a test in a temporary directory."""
+    path = tmp_path / "catalogs"
+    monkeypatch.setattr(variables, "DEFAULT_CACHE_DIR", path)
+    return path
+
+
+@pytest.fixture
+def api(catalog_dir, monkeypatch):
+    """A running :class:`FakeCensusApi` that every call is sent to."""
+    monkeypatch.setattr(retry, "BACKOFF_BASE", 0.001)
+    with FakeCensusApi() as api:
+        yield api
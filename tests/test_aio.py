@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from tidycensus import retry
+from tidycensus.acs import get_acs
+from tidycensus.cache import DiskCache
+from tidycensus.testing import FakeCensusApi
+
+httpx = pytest.importorskip("httpx")
+
+from tidycensus.aio import (  # noqa: E402
+    acquire,
+    aget_acs,
+    aload_data_acs,
+    asend_with_retries,
+    create_client,
+    release,
+)
+
+
+def test_same_results_as_get_acs(api, tmp_path):
+    kwargs = dict(table="B01001", state=["PA", "DE"], key="abc", output="wide")
+    expected = get_acs("tract", **kwargs)
+
+    async def main():
+        async with create_client() as client:
+            return await asyncio.gather(
+                aget_acs("tract", client=client, **kwargs),
+                aget_acs(
+                    "county",
+                    ["B19013_001", "S0101_C01_001"],
+                    state="PA",
+                    key="abc",
+                    cache=DiskCache(tmp_path / "responses"),
+                ),
+            )
+
+    api.fail_next(1, status=503, retry_after=0)
+    dat, mixed = asyncio.run(main())
+    assert dat.equals(expected)
+    assert mixed["variable"].unique().tolist() == ["B19013_001", "S0101_C01_001"]
+
+
+def test_load_data(api):
+    dat = asyncio.run(
+        aload_data_acs("state", "B01003_001E,B01003_001M", "abc", 2019, "acs5")
+    )
+    assert set(dat.columns) == {"GEOID", "NAME", "B01003_001E", "B01003_001M"}
+    assert dat["GEOID"].is_unique
+
+    with pytest.raises(ValueError, match="invalid or inactive"):
+        api.invalid_keys.add("bad")
+        asyncio.run(
+            aload_data_acs("state", "B01003_001E,B01003_001M", "bad", 2019, "acs5")
+        )
+
+
+def test_cancel(catalog_dir):
+    async def main():
+        task = asyncio.ensure_future(
+            aget_acs("tract", "B01003_001", state=["PA", "DE", "NJ"], key="abc")
+        )
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with FakeCensusApi(latency=2) as api:
+        asyncio.run(main())
+        limiter = retry.host_limiter(api.url)
+    assert limiter.in_flight == 0
+
+
+def test_timeout(monkeypatch):
+    monkeypatch.setattr(retry, "BACKOFF_BASE", 0.001)
+
+    async def main(url):
+        async with create_client() as client:
+            return await asend_with_retries(
+                client,
+                f"{url}/2019/acs/acs5?get=NAME&for=state:*",
+                max_attempts=2,
+                timeout=(1, 0.1),
+            )
+
+    with FakeCensusApi(latency=0.5) as api:
+        with pytest.raises(httpx.ReadTimeout):
+            asyncio.run(main(api.url))
+    assert len(api.requests) == 2
+
+
+def test_acquire_in_arrival_order(monkeypatch):
+    limiter = retry.RateLimiter(max_concurrency=1)
+    try_acquire = limiter.try_acquire
+    tries = []
+    monkeypatch.setattr(
+        limiter, "try_acquire", lambda: tries.append(1) or try_acquire()
+    )
+    order = []
+
+    async def work(i):
+        await acquire(limiter)
+        order.append(i)
+        await asyncio.sleep(0.01)
+        release(limiter)
+
+    async def main():
+        await asyncio.gather(*(work(i) for i in range(20)))
+
+    asyncio.run(main())
+    assert order == list(range(20))
+
+    # Waiting calls are woken when a slot frees up, rather than polling
+    assert len(tries) < 3 * 20
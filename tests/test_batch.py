@@ -0,0 +1,84 @@
+import pytest
+
+from tidycensus.acs import get_acs
+from tidycensus.batch import get_acs_batch, plan_batch
+
+
+def test_plan_batch_merges_shared_requests():
+    specs, groups = plan_batch(
+        [
+            {
+                "geography": "county",
+                "variables": ["B01001_001", "B01001_002E"],
+                "state": "PA",
+            },
+            {"geography": "county", "variables": {"pop": "B01001_001E"}, "state": "PA"},
+            {
+                "geography": "county",
+                "variables": ["B19013_001", "S0101_C01_001"],
+                "state": "PA",
+            },
+            {"geography": "county", "variables": ["B01001_001"], "state": "NJ"},
+            {
+                "geography": "tract",
+                "variables": ["B01001_001"],
+                "state": "PA",
+                "year": 2018,
+            },
+        ]
+    )
+
+    assert specs[1]["renamed"] == {"B01001_001": "pop"}
+    assert len(groups) == 4
+
+    pa = groups[("county", 2019, "acs5", "B", None, ("PA",), (), (), (), ())]
+    assert list(pa) == ["B01001_001", "B01001_002", "B19013_001"]
+    assert ("county", 2019, "acs5", "S", None, ("PA",), (), (), (), ()) in groups
+
+
+def test_plan_batch_validates_specs():
+    with pytest.raises(ValueError, match="geography"):
+        plan_batch([{"variables": ["B01001_001"]}])
+    with pytest.raises(ValueError, match="moe_level"):
+        plan_batch(
+            [{"geography": "state", "variables": ["B01001_001"], "moe_level": 80}]
+        )
+    with pytest.raises(ValueError, match="Unknown"):
+        plan_batch([{"geography": "state", "variables": ["B01001_001"], "foo": 1}])
+
+
+def test_batch_matches_get_acs(api):
+    api.missing_rate = 0.1
+    mixed = ["B19013_001", "S0101_C01_001", "DP02_0001"]
+    specs = [
+        {"geography": "county", "variables": ["B01001_001"], "state": ["PA", "NJ"]},
+        {"geography": "county", "variables": mixed, "state": "PA"},
+        {
+            "geography": "county",
+            "variables": mixed,
+            "state": "PA",
+            "output": "wide",
+            "annotate_missing": True,
+        },
+        {
+            "geography": "county",
+            "variables": {"pop": "B01001_001", "age": "S0101_C01_001"},
+            "state": "PA",
+            "moe_level": 95,
+        },
+        {
+            "geography": "tract",
+            "table": "B01001",
+            "state": ["PA", "DE"],
+            "compact": True,
+        },
+    ]
+
+    results = get_acs_batch(specs, key="abc")
+    n_calls = len(api.requests)
+    for spec, result in zip(specs, results):
+        assert result.equals(get_acs(key="abc", **spec))
+
+    # One call per table type for the PA counties of every spec, one for
+    # PA and NJ, and one group() call per state for the tract table
+    assert n_calls == 4 + 2
@@ -0,0 +1,66 @@
+import os
+import pickle
+import time
+
+from tidycensus.cache import DiskCache, request_key, resolve_cache
+
+
+def test_request_key_ignores_api_key_and_variable_order():
+    base = "https://api.census.gov/data/2019/acs/acs5"
+    a = request_key(base, {"get": "B01001_001E,B01001_001M,NAME", "for": "state:*"})
+    b = request_key(
+        base, {"get": "NAME,B01001_001M,B01001_001E", "for": "state:*", "key": "abc"}
+    )
+    assert a == b
+    assert a != request_key(base, {"get": "NAME", "for": "county:*"})
+
+
+def test_disk_cache_roundtrip_and_ttl(tmp_path):
+    cache = DiskCache(tmp_path, ttl=60)
+    assert cache.get("missing") is None
+
+    cache.set("a", {"x": 1})
+    assert cache.get("a") == {"x": 1}
+    assert "a" in cache and "missing" not in cache
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert "a" not in cache
+    assert cache.get("a") is None
+    assert not list(tmp_path.glob("*.pkl"))
+
+
+def test_disk_cache_drops_unreadable_entries(tmp_path):
+    cache = DiskCache(tmp_path)
+    (tmp_path / "truncated.pkl").write_bytes(b"\x80")
+    (tmp_path / "malformed.pkl").write_bytes(pickle.dumps(1))
+
+    for key in ["truncated", "malformed"]:
+        assert cache.get(key) is None
+        assert not (tmp_path / f"{key}.pkl").exists()
+
+
+def test_disk_cache_lru_eviction(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=None)
+    payload = b"x" * 1000
+    for i, name in enumerate(["a", "b", "c"]):
+        cache.set(name, payload)
+        os.utime(cache._entry(name), (i, i))
+
+    # Reading "a" makes it the most recently used entry
+    assert cache.get("a") == payload
+
+    cache.max_bytes = 2 * cache._entry("a").stat().st_size
+    cache.evict()
+    assert cache.get("b") is None
+    assert cache.get("a") == payload
+    assert cache.get("c") == payload
+
+
+def test_resolve_cache(tmp_path):
+    assert resolve_cache(False) is None
+    assert resolve_cache(None) is None
+    assert isinstance(resolve_cache(True), DiskCache)
+
+    cache = DiskCache(tmp_path)
+    assert resolve_cache(cache) is cache
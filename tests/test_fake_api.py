@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from tidycensus.acs import get_acs, iter_acs
+from tidycensus.cache import DiskCache
+from tidycensus.testing import FakeCensusApi
+
+
+def test_tables_by_state(api):
+    dat = get_acs("tract", table="B01001", state=["PA", "DE"], key="abc")
+
+    # One group() call per state
+    assert [params["get"] for _, params in api.requests] == ["group(B01001),NAME"] * 2
+    assert dat["GEOID"].str[:2].unique().tolist() == ["42", "10"]
+    assert dat["variable"].nunique() == 49
+    assert len(dat) == 49 * 4 * (3 + 67)
+
+
+def test_mixed_tables_and_counties(api):
+    dat = get_acs(
+        "county",
+        ["B19013_001", "S0101_C01_001", "DP02_0001"],
+        state="PA",
+        county=["Adams", "Allegheny"],
+        key="abc",
+        output="wide",
+    )
+    assert dat["GEOID"].tolist() == ["42001", "42003"]
+    assert dat.shape == (2, 8)
+    assert sorted(path for path, _ in api.requests) == [
+        "/data/2019/acs/acs5",
+        "/data/2019/acs/acs5/profile",
+        "/data/2019/acs/acs5/subject",
+    ]
+
+
+def test_errors_retries_and_cache(api, tmp_path):
+    api.fail_next(2, status=503, retry_after=0)
+    cache = DiskCache(tmp_path / "responses")
+    dat = get_acs("state", "B01003_001", key="abc", cache=cache)
+    assert len(api.requests) == 3
+
+    assert get_acs("state", "B01003_001", key="abc", cache=cache).equals(dat)
+    assert len(api.requests) == 3
+
+    with pytest.raises(ValueError, match="unknown variable"):
+        get_acs("state", "B99999_001", key="abc")
+
+    api.invalid_keys.add("bad")
+    with pytest.raises(ValueError, match="invalid or inactive"):
+        get_acs("state", "B01003_001", key="bad")
+
+
+def test_recorded_fixtures(api, tmp_path):
+    fixtures = tmp_path / "fixtures"
+
+    # Record responses from an upstream API, then replay them
+    with FakeCensusApi(fixtures=fixtures, upstream=api.url):
+        recorded = get_acs("county", "B01003_001", state="PA", key="abc")
+    assert len(list(fixtures.glob("*.json"))) == 1
+
+    with FakeCensusApi(fixtures=fixtures, seed=1) as replay:
+        assert get_acs("county", "B01003_001", state="PA", key="abc").equals(recorded)
+        assert not get_acs("county", "B01003_001", state="NJ", key="abc").empty
+    assert len(replay.requests) == 2
+
+
+@pytest.mark.parametrize("runner", ["get_acs", "iter_acs", "aget_acs"])
+def test_group_call_falls_back_to_chunks(api, runner):
+    kwargs = dict(table="B01001", state="PA", key="abc", output="wide")
+    expected = get_acs("county", **kwargs)
+    assert len(api.requests) == 1
+
+    # The group() call fails, so the table is fetched in 24-variable chunks
+    api.fail_next(1, status=400)
+    if runner == "get_acs":
+        dat = get_acs("county", **kwargs)
+    elif runner == "iter_acs":
+        (dat,) = iter_acs("county", **kwargs)
+    else:
+        pytest.importorskip("httpx")
+        from tidycensus.aio import aget_acs
+
+        dat = asyncio.run(aget_acs("county", **kwargs))
+
+    gets = [params["get"] for _, params in api.requests[1:]]
+    assert gets[0] == "group(B01001),NAME"
+    assert sorted(len(get.split(",")) for get in gets[1:]) == [3, 49, 49]
+    assert dat.equals(expected)
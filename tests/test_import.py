@@ -0,0 +1,48 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import tidycensus
+
+# Budget for `import tidycensus` alone, in microseconds
+IMPORT_BUDGET_US = 50_000
+
+HEAVY_MODULES = ["pandas", "numpy", "requests", "loguru", "tryagain"]
+
+
+def run_python(code):
+    env = dict(os.environ)
+    src = str(Path(tidycensus.__file__).parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join([src, env.get("PYTHONPATH", "")])
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+
+def test_import_is_lazy():
+    code = "import sys, tidycensus; print(','.join(sorted(sys.modules)))"
+    loaded = set(run_python(code).stdout.strip().split(","))
+    assert not loaded & set(HEAVY_MODULES)
+
+
+def test_import_time_budget():
+    stderr = run_python("import tidycensus").stderr
+    for line in stderr.splitlines():
+        _, _, cumulative, name = [x.strip() for x in line.replace(":", "|").split("|")]
+        if name == "tidycensus":
+            assert int(cumulative) < IMPORT_BUDGET_US
+            break
+    else:
+        raise AssertionError("tidycensus not found in -X importtime output")
+
+
+def test_lazy_attributes():
+    from tidycensus.acs import get_acs
+
+    assert tidycensus.get_acs is get_acs
+    assert "get_acs" in dir(tidycensus)
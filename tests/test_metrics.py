@@ -0,0 +1,48 @@
+from tidycensus.acs import get_acs
+from tidycensus.cache import DiskCache
+from tidycensus.metrics import (
+    MetricsCollector,
+    add_metrics_hook,
+    emit,
+    remove_metrics_hook,
+)
+
+
+def test_hooks():
+    events = []
+    hook = add_metrics_hook(events.append)
+    emit("parse", 0.5, rows=10)
+    remove_metrics_hook(hook)
+    emit("parse", 0.5, rows=10)
+
+    assert len(events) == 1
+    assert events[0].stage == "parse"
+    assert events[0].rows == 10
+    assert events[0].cache_hit is None
+
+
+def test_collector_summary(api, tmp_path):
+    cache = DiskCache(tmp_path / "responses")
+
+    with MetricsCollector() as metrics:
+        api.fail_next(1, status=503, retry_after=0)
+        get_acs("county", "B01003_001", state=["PA", "DE"], key="abc", cache=cache)
+        get_acs("county", "B01003_001", state=["PA", "DE"], key="abc", cache=cache)
+
+    summary = metrics.summary()
+    assert summary["cache"]["cache_misses"] == 1
+    assert summary["cache"]["cache_hits"] == 1
+    assert summary["http"]["count"] == 1
+    assert summary["http"]["retries"] == 1
+    assert summary["http"]["bytes"] > 0
+    assert summary["parse"]["rows"] == 67 + 3
+    assert summary["reshape"]["rows"] == 2 * (67 + 3)
+    assert {"clean", "combine"} <= set(summary)
+
+    events = metrics.to_frame()
+    assert len(events) == sum(stage["count"] for stage in summary.values())
+    assert (events["elapsed"] >= 0).all()
+
+    # The collector stops listening when the block ends
+    emit("parse")
+    assert len(metrics.events) == len(events)
@@ -0,0 +1,40 @@
+from tidycensus import panel
+from tidycensus.variables import build_catalog
+
+
+def test_get_acs_panel(monkeypatch, fake_responses):
+
+    # B01001_002 is only published in 2019
+    def load_variables_acs(year, survey, session=None):
+        names = ["B01001_001"] + (["B01001_002"] if year == 2019 else [])
+        return build_catalog(
+            {
+                f"{name}E": {
+                    "label": "Estimate!!Total",
+                    "concept": "",
+                    "group": "B01001",
+                }
+                for name in names
+            }
+        )
+
+    monkeypatch.setattr(panel, "load_variables_acs", load_variables_acs)
+
+    cache = fake_responses("county", variables=["B01001_001"], state="PA", year=2018)
+    fake_responses("county", cache=cache, variables=["B01001_001"], state="PA")
+    fake_responses(
+        "county", cache=cache, variables=["B01001_001", "B01001_002"], state="PA"
+    )
+    kwargs = dict(state="PA", key="abc", cache=cache)
+
+    long = panel.get_acs_panel(
+        "county", [2019, 2018], variables=["B01001_001", "B01001_002"], **kwargs
+    )
+    assert list(long.columns[:2]) == ["year", "GEOID"]
+    assert long.groupby("year")["variable"].nunique().to_dict() == {2018: 1, 2019: 2}
+
+    wide = panel.get_acs_panel(
+        "county", [2018, 2019], variables=["B01001_001"], layout="wide", **kwargs
+    )
+    assert wide.shape == (2, 6)
+    assert "B01001_001E_2018" in wide and "B01001_001M_2019" in wide
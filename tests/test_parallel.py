@@ -0,0 +1,33 @@
+import random
+import time
+
+import pytest
+
+from tidycensus.parallel import map_concurrent
+
+
+def test_map_concurrent_preserves_order():
+    def work(i):
+        time.sleep(random.random() / 100)
+        return i * 2
+
+    assert map_concurrent(work, range(20), max_workers=4) == [i * 2 for i in range(20)]
+    assert map_concurrent(work, range(3), max_workers=1) == [0, 2, 4]
+
+
+def test_map_concurrent_raises_first_error():
+    def work(i):
+        if i in (3, 5):
+            raise ValueError(f"bad {i}")
+        return i
+
+    with pytest.raises(ValueError, match="bad 3"):
+        map_concurrent(work, range(8), max_workers=4)
+
+
+def test_map_concurrent_reports_progress():
+    seen = []
+    map_concurrent(
+        lambda i: i, range(5), max_workers=3, progress=lambda *x: seen.append(x)
+    )
+    assert sorted(seen) == [(i, 5) for i in range(1, 6)]
@@ -0,0 +1,98 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tidycensus.parsers import (
+    annotation_codes,
+    build_geoid,
+    parse_response,
+    replace_missing,
+)
+
+
+def test_build_geoid_uses_geographic_order():
+    dat = pd.DataFrame(
+        {
+            "block group": ["1", "2"],
+            "tract": ["000100", "000200"],
+            "state": ["42", "42"],
+            "county": ["101", "101"],
+        },
+        dtype=object,
+    )
+    geoid = build_geoid(dat, ["block group", "tract", "state", "county"])
+    assert geoid.tolist() == ["421010001001", "421010002002"]
+
+    assert build_geoid(dat, ["state"]).tolist() == ["42", "42"]
+
+
+def test_parse_response():
+    content = json.dumps(
+        [
+            ["NAME", "B01001_001E", "B01001_001M", "state", "county"],
+            ["Adams County", "100", "12.5", "42", "001"],
+            ["Allegheny County", None, "-555555555", "42", "003"],
+        ]
+    )
+    dat = parse_response(content, ["B01001_001E", "B01001_001M"])
+    assert dat.columns.tolist() == ["NAME", "B01001_001E", "B01001_001M", "GEOID"]
+    assert dat["GEOID"].tolist() == ["42001", "42003"]
+    assert dat["B01001_001M"].tolist() == [12.5, -555555555]
+    assert np.isnan(dat["B01001_001E"].iloc[1])
+
+
+def test_parse_response_coerces_bad_values():
+    content = b'[["B01001_001E","NAME","us"],["oops","United States","1"]]'
+    dat = parse_response(content, ["B01001_001E"])
+    assert np.isnan(dat["B01001_001E"].iloc[0])
+    assert dat["GEOID"].tolist() == ["1"]
+
+
+def test_replace_missing():
+    dat = pd.DataFrame(
+        {"GEOID": ["1", "2"], "XE": [1.0, -555555555], "XM": [-222222222, 3]}
+    )
+    result, codes = replace_missing(dat, ["XE", "XM"], annotate=True)
+    assert result["XE"].tolist()[0] == 1.0 and np.isnan(result["XE"].iloc[1])
+    assert np.isnan(result["XM"].iloc[0]) and result["XM"].iloc[1] == 3
+    assert dat["XE"].iloc[1] == -555555555  # the input is left alone
+    assert list(annotation_codes(codes["XM"].to_numpy()))[0] == -222222222
+
+    result, codes = replace_missing(dat, ["XE", "XM"])
+    assert codes is None
+
+
+def test_parse_response_drops_unrequested_columns():
+    # As returned by get=group(B01001),NAME
+    content = json.dumps(
+        [
+            [
+                "GEO_ID",
+                "NAME",
+                "B01001_001E",
+                "B01001_001EA",
+                "B01001_001M",
+                "B01001_001MA",
+                "NAME",
+                "state",
+            ],
+            [
+                "0400000US42",
+                "Pennsylvania",
+                "100",
+                None,
+                "5",
+                None,
+                "Pennsylvania",
+                "42",
+            ],
+        ]
+    )
+    dat = parse_response(content, ["B01001_001E", "B01001_001M"])
+    assert dat.columns.tolist() == ["NAME", "B01001_001E", "B01001_001M", "GEOID"]
+    assert dat["GEOID"].tolist() == ["42"]
+
+    with pytest.raises(ValueError, match="B01001_002E"):
+        parse_response(content, ["B01001_002E"])
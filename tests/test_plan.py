@@ -0,0 +1,93 @@
+import pytest
+
+from tidycensus.acs import get_acs, iter_acs
+
+
+def test_plan_mixed_table_types():
+    plan = get_acs(
+        "tract",
+        ["B01001_001", "S0101_C01_001", "DP02_0001"],
+        state=["PA", "NJ"],
+        key="abc",
+        explain=True,
+    )
+
+    assert [(p.kind, p.state) for p in plan.partitions] == [
+        ("B", ("PA",)),
+        ("B", ("NJ",)),
+        ("S", ("PA",)),
+        ("S", ("NJ",)),
+        ("DP", ("PA",)),
+        ("DP", ("NJ",)),
+    ]
+    assert plan.n_calls == 6 and plan.n_cached == 0
+    assert plan.calls[2].base.endswith("/acs5/subject")
+    assert plan.calls[1].params["in"] == "state:34"
+    assert "abc" not in plan.explain()
+    assert "[type=B state=PA] 1 variables" in plan.explain()
+
+
+def test_execute_plan_from_cache_with_executor(fake_responses):
+    variables = ["B01001_001", "S0101_C01_001"]
+    cache = fake_responses("county", variables=variables, state="PA")
+
+    plan = get_acs(
+        "county", variables, state="PA", key="abc", cache=cache, explain=True
+    )
+    assert plan.n_cached == plan.n_calls == 2
+
+    used = []
+
+    def executor(func, items):
+        used.append(len(items))
+        return [func(item) for item in items]
+
+    tidy = get_acs(
+        "county", variables, state="PA", key="abc", cache=cache, executor=executor
+    )
+    assert used == [2]
+    assert tidy["GEOID"].tolist() == ["42001"] * 2 + ["42003"] * 2
+    assert set(tidy["variable"]) == set(variables)
+
+    wide = get_acs(
+        "county", variables, state="PA", key="abc", cache=cache, output="wide"
+    )
+    assert wide.shape == (2, 6)
+    assert wide["S0101_C01_001E"].tolist() == [1.0, 2.0]
+
+
+def test_iter_acs_yields_partitions(fake_responses):
+    variables = [f"B01001_{i:03d}" for i in range(1, 31)]
+    cache = fake_responses("tract", variables=variables, state=["PA", "NJ"])
+
+    kwargs = dict(state=["PA", "NJ"], key="abc", cache=cache, max_workers=2)
+    by_state = list(iter_acs("tract", variables, **kwargs))
+    assert [len(dat) for dat in by_state] == [60, 60]
+
+    by_chunk = list(iter_acs("tract", variables, output="wide", by="chunk", **kwargs))
+    assert sorted(dat.shape[1] for dat in by_chunk) == [14, 14, 50, 50]
+
+
+def test_get_acs_compact(fake_responses):
+    cache = fake_responses("county", variables=["B01001_001"], state="PA")
+    tidy = get_acs("county", ["B01001_001"], state="PA", key="abc", cache=cache)
+    small = get_acs(
+        "county", ["B01001_001"], state="PA", key="abc", cache=cache, compact=True
+    )
+
+    assert small["estimate"].dtype == "float32"
+    assert small.attrs["compact"]["after"] < small.attrs["compact"]["before"]
+    assert small["estimate"].tolist() == tidy["estimate"].tolist()
+
+
+def test_failed_chunk_names_its_variables(api):
+    variables = [f"B01001_{i:03d}" for i in range(1, 31)]
+    chunks = [
+        ",".join(f"{v}{suffix}" for v in chunk for suffix in "EM")
+        for chunk in [variables[:24], variables[24:]]
+    ]
+
+    api.fail_next(1, status=400)
+    with pytest.raises(ValueError, match="Failed to load variables") as error:
+        get_acs("county", variables, state="PA", key="abc", max_workers=1)
+    assert any(chunk in str(error.value) for chunk in chunks)
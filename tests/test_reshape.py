@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+
+from tidycensus.reshape import combine_chunks, compact_dtypes, to_tidy
+
+
+def legacy_tidy(sub, moe_factor):
+    # The melt/apply/pivot pipeline previously used by get_acs
+    result = (
+        sub.melt(id_vars=["GEOID", "NAME"], var_name="variable")
+        .assign(
+            variable2=lambda df: df["variable"].apply(
+                lambda x: "estimate" if x.endswith("E") else "moe"
+            ),
+            variable=lambda df: df["variable"].str.slice(0, -1),
+        )
+        .pivot(index=["GEOID", "NAME", "variable"], columns="variable2", values="value")
+        .reset_index()
+        .rename_axis(None, axis=1)
+    )
+    if "moe" in result.columns:
+        result["moe"] *= moe_factor
+    return result
+
+
+def make_wide(n_rows, variables, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 10_000, (n_rows, len(variables))).astype(float)
+    values[rng.random(values.shape) < 0.1] = np.nan
+    dat = pd.DataFrame(values, columns=variables)
+    dat.insert(0, "GEOID", [f"42{i:03d}" for i in rng.permutation(n_rows)])
+    dat.insert(1, "NAME", [f"County {i % 7}" for i in range(n_rows)])
+    return dat
+
+
+def test_to_tidy_matches_legacy_output():
+    # B00001_001 has no MOE
+    variables = [
+        "B01001_002E",
+        "B01001_002M",
+        "B00001_001E",
+        "B01001_001E",
+        "B01001_001M",
+    ]
+    dat = make_wide(50, variables)
+    for moe_factor in [1, 1.96 / 1.645]:
+        tm.assert_frame_equal(
+            to_tidy(dat, variables, moe_factor=moe_factor), legacy_tidy(dat, moe_factor)
+        )
+
+
+def test_to_tidy_estimates_only():
+    variables = ["B00001_001E", "B00002_001E"]
+    dat = make_wide(10, variables)
+    result = to_tidy(dat, variables)
+    assert result.columns.tolist() == ["GEOID", "NAME", "variable", "estimate"]
+    tm.assert_frame_equal(result, legacy_tidy(dat, 1))
+
+
+def test_combine_chunks():
+    a = make_wide(20, ["B01001_001E", "B01001_001M"], seed=1)
+    b = a[["GEOID", "NAME"]].assign(B01001_002E=np.arange(20.0))
+    c = a[["GEOID", "NAME"]].assign(B01001_003E=np.arange(20.0) * 2)
+
+    expected = a.merge(b, on=["GEOID", "NAME"]).merge(c, on=["GEOID", "NAME"])
+    result = combine_chunks([a, b, c])
+    cols = ["GEOID", "NAME", "B01001_001E", "B01001_001M", "B01001_002E", "B01001_003E"]
+    tm.assert_frame_equal(result[cols], expected[cols])
+
+
+def test_combine_chunks_mismatched_rows():
+    a = pd.DataFrame({"GEOID": ["1", "2"], "NAME": ["A", "B"], "XE": [1.0, 2.0]})
+    b = pd.DataFrame({"GEOID": ["3", "1"], "NAME": ["C", "A"], "YE": [3.0, 1.0]})
+    result = combine_chunks([a, b]).set_index("GEOID")
+    assert result.index.tolist() == ["1", "2", "3"]
+    assert result["NAME"].tolist() == ["A", "B", "C"]
+    assert result["YE"].tolist()[0] == 1.0 and np.isnan(result["YE"]["2"])
+
+
+def test_compact_dtypes_is_lossless():
+    dat = pd.DataFrame(
+        {
+            "GEOID": ["01", "01", "02", "02"],
+            "NAME": ["Alabama", "Alabama", "Alaska", "Alaska"],
+            "variable": ["a", "b", "a", "b"],
+            "estimate": [1.0, np.nan, 2.5, 3.0],
+            "moe": [1.0, 2.0, 0.1, 2.0 ** 40 + 1],
+        }
+    )
+    result = compact_dtypes(dat)
+
+    assert isinstance(result["NAME"].dtype, pd.CategoricalDtype)
+    assert result["estimate"].dtype == np.float32
+    assert result["moe"].dtype == np.float64
+    assert result.attrs["compact"]["saved"] > 0
+    tm.assert_frame_equal(
+        result.astype({"GEOID": "str", "NAME": "str", "variable": "str"}).astype(
+            {"estimate": "float64"}
+        ),
+        dat,
+    )
@@ -0,0 +1,115 @@
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from tidycensus import parallel, retry
+from tidycensus.parallel import map_concurrent, set_host_limit
+
+
+@pytest.fixture
+def server():
+    """A local server that answers with the queued statuses, then 200s."""
+    state = {"statuses": [], "hits": 0, "stalls": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["hits"] += 1
+            if state["stalls"]:
+                state["stalls"] -= 1
+                time.sleep(0.5)
+            status, headers = (
+                state["statuses"].pop(0) if len(state["statuses"]) else (200, {})
+            )
+            body = b"[]"
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{httpd.server_port}/data"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_retry_after_seconds():
+    assert retry.retry_after_seconds("3") == 3
+    assert retry.retry_after_seconds(None) is None
+    assert (
+        8 < retry.retry_after_seconds(formatdate(time.time() + 10, usegmt=True)) <= 10
+    )
+    assert retry.retry_after_seconds("soon") is None
+
+    # Huge delays are capped
+    assert retry.retry_after_seconds("86400") == retry.RETRY_AFTER_MAX
+
+
+def test_send_with_retries(server, monkeypatch):
+    monkeypatch.setattr(retry, "BACKOFF_BASE", 0.001)
+    server["statuses"] = [(503, {"Retry-After": "0"}), (429, {}), (500, {})]
+
+    call = retry.send_with_retries(requests.Session(), server["url"])
+    assert call.status_code == 200
+    assert server["hits"] == 4
+
+    # Both throttled responses lowered the concurrency limit
+    limiter = retry.host_limiter(server["url"])
+    assert limiter.limit < parallel.MAX_REQUESTS_PER_HOST / 2
+
+    # Client errors are not retried, and retries run out
+    server["statuses"] = [(400, {})] + [(502, {})] * 2
+    assert retry.send_with_retries(requests.Session(), server["url"]).status_code == 400
+    call = retry.send_with_retries(requests.Session(), server["url"], max_attempts=2)
+    assert call.status_code == 502
+
+    # Stalled calls time out and are retried
+    server["stalls"] = 1
+    call = retry.send_with_retries(requests.Session(), server["url"], timeout=0.1)
+    assert call.status_code == 200
+    server["stalls"] = 2
+    with pytest.raises(requests.Timeout):
+        retry.send_with_retries(
+            requests.Session(), server["url"], max_attempts=2, timeout=0.1
+        )
+
+
+def test_limiter_caps_concurrency_and_rate():
+    limit = parallel.MAX_REQUESTS_PER_HOST
+    set_host_limit(2)
+    try:
+        limiter = retry.host_limiter("https://api.census.gov/data/2019/acs/acs5")
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def work(i):
+            limiter.acquire()
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.01)
+            with lock:
+                active[0] -= 1
+            limiter.release()
+
+        map_concurrent(work, range(10), max_workers=8)
+        assert peak[0] <= 2
+    finally:
+        set_host_limit(limit)
+
+    limiter = retry.RateLimiter(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+        limiter.release()
+    assert time.monotonic() - start >= 0.09
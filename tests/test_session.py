@@ -0,0 +1,52 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from tidycensus import session as census_session
+from tidycensus.loaders import load_data_acs
+
+
+def test_create_session_pooling_and_compression():
+    s = census_session.create_session(pool_size=4)
+    assert "gzip" in s.headers["Accept-Encoding"]
+    assert s.get_adapter("https://api.census.gov")._pool_maxsize == 4
+
+
+def test_injected_session_and_api_url():
+    seen = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen["path"] = self.path
+            seen["encoding"] = self.headers["Accept-Encoding"]
+            body = json.dumps(
+                [["B01001_001E", "NAME", "state"], ["100", "Alabama", "01"]]
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    old_url = census_session.get_api_url()
+    census_session.set_session(
+        census_session.create_session(),
+        api_url=f"http://127.0.0.1:{server.server_port}/data",
+    )
+    try:
+        dat = load_data_acs("state", "B01001_001E", "key", 2019, "acs5")
+    finally:
+        census_session.set_session(None, api_url=old_url)
+        server.shutdown()
+        server.server_close()
+
+    assert seen["path"].startswith("/data/2019/acs/acs5?")
+    assert "gzip" in seen["encoding"]
+    assert dat["GEOID"].tolist() == ["01"]
+    assert dat["B01001_001E"].tolist() == [100]
@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from tidycensus.acs import get_acs
+from tidycensus.sink import read_acs_dataset, sink_acs
+
+pytest.importorskip("pyarrow")
+
+
+def test_sink_and_read_dataset(tmp_path, fake_responses):
+    variables = ["B01001_001", "S0101_C01_001"]
+    cache = fake_responses("county", variables=variables, output="wide")
+    kwargs = dict(variables=variables, output="wide", key="abc", cache=cache)
+
+    manifest = sink_acs(tmp_path, "county", **kwargs)
+    assert manifest["rows"] == 4
+    assert {entry["path"].split("/")[2] for entry in manifest["files"]} == {"state=42"}
+    assert (tmp_path / "_manifest.json").exists()
+
+    expected = get_acs("county", **kwargs)
+    pd.testing.assert_frame_equal(read_acs_dataset(tmp_path), expected)
+
+    dat = read_acs_dataset(tmp_path, columns=["B01001_001E"], state="PA")
+    assert list(dat.columns) == ["GEOID", "NAME", "B01001_001E"]
+    assert read_acs_dataset(tmp_path, state="NJ").empty
+
+    # Reruns are answered from the dataset; other requests need overwrite
+    cache.clear()
+    assert sink_acs(tmp_path, "county", **kwargs)["request"] == manifest["request"]
+    with pytest.raises(ValueError, match="overwrite"):
+        sink_acs(tmp_path, "county", variables=["B01001_001"], key="abc", cache=cache)
+
+
+@pytest.mark.parametrize("by", ["state", "chunk"])
+def test_tidy_round_trip(tmp_path, api, by):
+    variables = [f"B01001_{i:03d}" for i in range(1, 31)]
+
+    # Tracts are fetched state by state, which one table type keeps in the
+    # order requested; several table types are merged by GEOID
+    for i, extra in enumerate([[], ["S0101_C01_001"]]):
+        kwargs = dict(variables=variables + extra, state=["PA", "NJ"], key="abc")
+        sink_acs(tmp_path / str(i), "tract", by=by, **kwargs)
+        expected = get_acs("tract", **kwargs)
+        pd.testing.assert_frame_equal(read_acs_dataset(tmp_path / str(i)), expected)
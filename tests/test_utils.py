@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from tidycensus import utils
+from tidycensus.utils import (
+    CountyMatch,
+    fips_index,
+    resolve_counties,
+    validate_county,
+    validate_state,
+)
+
+
+def test_validate_state():
+    assert validate_state("PA") == "42"
+    assert validate_state(" pennsylvania ") == "42"
+    assert validate_state("6") == "06"
+    assert validate_state("42101") == "42"
+    with pytest.raises(ValueError):
+        validate_state("narnia")
+
+
+def test_validate_county():
+    assert validate_county("PA", "101") == "101"
+    assert validate_county("PA", "Philadelphia") == "101"
+    assert validate_county("MD", "Prince George's") == "033"
+    with pytest.raises(ValueError, match="matches"):
+        validate_county("MD", "Baltimore")
+    with pytest.raises(ValueError, match="not a valid name"):
+        validate_county("PA", "Gotham")
+
+
+def test_fips_index_is_built_once(monkeypatch):
+    monkeypatch.setattr(utils, "_fips_index", None)
+    indexes = []
+    threads = [
+        threading.Thread(target=lambda: indexes.append(fips_index())) for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(index is indexes[0] for index in indexes)
+    assert indexes[0].state_by_abb["pa"] == "42"
+
+
+def test_resolve_counties():
+    result = resolve_counties(
+        ["baltimore", "Prince George's", "St. Mary", "Gotham"], "MD"
+    )
+    assert sorted(m.county for m in result["baltimore"]) == ["005", "510"]
+    assert result["Prince George's"] == [
+        CountyMatch("24", "033", "Prince George's County")
+    ]
+    assert [m.name for m in result["St. Mary"]] == ["St. Mary's County"]
+    assert result["Gotham"] == []
+
+    # Across all states
+    matches = resolve_counties("Philadelphia")["Philadelphia"]
+    assert matches == [CountyMatch("42", "101", "Philadelphia County")]
+    assert len(resolve_counties("Washington")["Washington"]) > 20
@@ -0,0 +1,88 @@
+import json
+import time
+
+import pytest
+
+from tidycensus import variables
+from tidycensus.loaders import format_variables_acs
+from tidycensus.parallel import map_concurrent
+from tidycensus.variables import (
+    build_catalog,
+    load_variables_acs,
+    variable_labels,
+    variables_from_table_acs,
+)
+
+RAW = {
+    "NAME": {"label": "Geographic Area Name", "group": "N/A"},
+    "B01001_001E": {
+        "label": "Estimate!!Total:",
+        "concept": "SEX BY AGE",
+        "group": "B01001",
+    },
+    "B01001_001M": {"label": "Margin of Error!!Total:", "group": "B01001"},
+    "B01001_002E": {
+        "label": "Estimate!!Total:!!Male:",
+        "concept": "SEX BY AGE",
+        "group": "B01001",
+    },
+    "B01001_002M": {"label": "Margin of Error!!Total:!!Male:", "group": "B01001"},
+    "B01001_002EA": {
+        "label": "Annotation of Estimate!!Total:!!Male:",
+        "group": "B01001",
+    },
+    "B00001_001E": {
+        "label": "Estimate!!Total",
+        "concept": "UNWEIGHTED SAMPLE COUNT",
+        "group": "B00001",
+    },
+}
+
+
+def test_build_catalog():
+    catalog = build_catalog(RAW)
+    assert catalog.tables == {
+        "B00001": ["B00001_001"],
+        "B01001": ["B01001_001", "B01001_002"],
+    }
+    assert catalog.variables["B01001_002"].label == "Total:!!Male:"
+    assert catalog.variables["B01001_002"].has_moe
+    assert not catalog.variables["B00001_001"].has_moe
+
+    assert format_variables_acs(["B00001_001", "B01001_001"], catalog) == (
+        "B01001_001E,B01001_001M,B00001_001E"
+    )
+
+
+def test_load_variables_from_disk(tmp_path):
+    catalog = build_catalog(RAW)
+    path = tmp_path / "variables" / "2019-acs5.json"
+    path.parent.mkdir()
+    path.write_text(json.dumps(list(catalog.variables.values())))
+
+    assert load_variables_acs(2019, "acs5", cache_dir=tmp_path) == catalog
+    assert variables_from_table_acs("B01001", 2019, "acs5", cache_dir=tmp_path) == [
+        "B01001_001",
+        "B01001_002",
+    ]
+    assert variable_labels(["B01001_001E"], 2019, "acs5", cache_dir=tmp_path) == {
+        "B01001_001E": "Total:"
+    }
+    with pytest.raises(ValueError):
+        variables_from_table_acs("B99999", 2019, "acs5", cache_dir=tmp_path)
+
+
+def test_catalogs_download_in_parallel(tmp_path, monkeypatch):
+    def download(year, survey, session=None):
+        time.sleep(0.3)
+        return build_catalog(RAW)
+
+    monkeypatch.setattr(variables, "_download_catalog", download)
+    start = time.monotonic()
+    catalogs = map_concurrent(
+        lambda year: load_variables_acs(year, "acs5", cache_dir=tmp_path),
+        range(2012, 2020),
+        max_workers=8,
+    )
+    assert time.monotonic() - start < 1.2
+    assert all(catalog == build_catalog(RAW) for catalog in catalogs)